@@ -0,0 +1,268 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Any, Iterator
+from urllib.parse import urlencode
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+import encar_insurance
+import encar_search
+import notion_writer
+from rate_limiter import Unlimited
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+_SEGMENT_NAME = "segment-{:06d}.jsonl.gz"
+
+
+class ArchiveMiss(KeyError):
+    """Replay asked for a request the archive never recorded."""
+
+
+def response_kind(url: str) -> str:
+    # Read at call time, so URLs that mock_server.redirect points elsewhere count.
+    notion_api_url = notion_writer.NOTION_API_URL
+    if url.startswith(encar_search.SEARCH_URL):
+        return "encar_search"
+    if url.startswith(encar_insurance.INSURANCE_URL):
+        return "insurance"
+    if url.startswith(f"{notion_api_url}/databases/") and url.endswith("/query"):
+        return "notion_query"
+    if url.startswith(notion_api_url):
+        return "notion"
+    return "other"
+
+
+def request_key(
+    method: str, url: str, params: Any = None, payload: Any = None
+) -> str:
+    if params:
+        url += ("&" if "?" in url else "?") + urlencode(params)
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False) if payload else ""
+    digest = hashlib.sha1(body.encode()).hexdigest()[:16] if body else "-"
+    return f"{method.upper()} {url} {digest}"
+
+
+class Archive:
+    """Append-only store of raw HTTP responses in gzip JSONL segments.
+
+    Every record is its own gzip member, so a segment is still one valid
+    gzip stream while index.jsonl can point at (segment, offset, length) to
+    read any record back without decompressing its neighbours.
+    """
+
+    def __init__(
+        self, directory: str = "archive", segment_bytes: int = DEFAULT_SEGMENT_BYTES
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.jsonl")
+        self.entries: list[dict[str, Any]] = []
+        self._latest: dict[str, dict[str, Any]] = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r", encoding="utf-8") as fp:
+                for line in fp:
+                    self._add_entry(json.loads(line))
+        self._segment = max((entry["segment"] for entry in self.entries), default=1)
+
+    def _add_entry(self, entry: dict[str, Any]) -> None:
+        self.entries.append(entry)
+        self._latest[entry["key"]] = entry
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, _SEGMENT_NAME.format(segment))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._latest
+
+    def append(self, key: str, kind: str, record: dict[str, Any]) -> None:
+        member = gzip.compress(
+            (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        )
+        path = self._segment_path(self._segment)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+            self._segment += 1
+            path = self._segment_path(self._segment)
+        with open(path, "ab") as fp:
+            offset = fp.tell()
+            fp.write(member)
+        entry = {
+            "key": key,
+            "kind": kind,
+            "segment": self._segment,
+            "offset": offset,
+            "length": len(member),
+            "time": record["time"],
+        }
+        with open(self._index_path, "a", encoding="utf-8") as fp:
+            fp.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._add_entry(entry)
+
+    def read(self, entry: dict[str, Any]) -> dict[str, Any]:
+        with open(self._segment_path(entry["segment"]), "rb") as fp:
+            fp.seek(entry["offset"])
+            return json.loads(gzip.decompress(fp.read(entry["length"])))
+
+    def lookup(self, key: str) -> dict[str, Any]:
+        """The latest record for a request key."""
+        entry = self._latest.get(key)
+        if entry is None:
+            raise ArchiveMiss(key)
+        return self.read(entry)
+
+    def records(self, kind: str | None = None) -> Iterator[dict[str, Any]]:
+        """Every record of a kind in the order they were archived.
+
+        Segments are read sequentially rather than through the index.
+        """
+        segments = sorted({entry["segment"] for entry in self.entries})
+        for segment in segments:
+            with gzip.open(self._segment_path(segment), "rt", encoding="utf-8") as fp:
+                for line in fp:
+                    record = json.loads(line)
+                    if kind is None or record["kind"] == kind:
+                        yield record
+
+
+class ArchivedResponse:
+    """The parts of an aiohttp response the fetch helpers use."""
+
+    def __init__(self, record: dict[str, Any]) -> None:
+        self.method = record["method"]
+        self.url = URL(record["url"])
+        self.status = record["status"]
+        self.headers = CIMultiDictProxy(CIMultiDict(record.get("headers") or {}))
+        self._text = record["text"]
+
+    async def read(self) -> bytes:
+        return self._text.encode("utf-8")
+
+    async def text(self) -> str:
+        return self._text
+
+    async def json(self, content_type: str | None = None) -> Any:
+        return json.loads(self._text)
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            request_info = aiohttp.RequestInfo(
+                self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url
+            )
+            raise aiohttp.ClientResponseError(
+                request_info, (), status=self.status, headers=self.headers
+            )
+
+
+class _RequestContext:
+    def __init__(self, send) -> None:
+        self._send = send
+
+    async def __aenter__(self) -> ArchivedResponse:
+        return await self._send
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+class _ArchiveSession:
+    def get(self, url: str, **kwargs) -> _RequestContext:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _RequestContext:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> _RequestContext:
+        return self.request("PATCH", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> _RequestContext:
+        return _RequestContext(self._send(method, url, **kwargs))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        return None
+
+
+class RecordingSession(_ArchiveSession):
+    """Wraps an aiohttp session and archives every response it reads."""
+
+    def __init__(self, session, archive: Archive) -> None:
+        self.session = session
+        self.archive = archive
+
+    async def _send(
+        self, method: str, url: str, params=None, json=None, **kwargs
+    ) -> ArchivedResponse:
+        async with self.session.request(
+            method, url, params=params, json=json, **kwargs
+        ) as r:
+            text = await r.text()
+            record = {
+                "kind": response_kind(url),
+                "method": method,
+                "url": url,
+                "params": list(params) if params else None,
+                "payload": json,
+                "status": r.status,
+                "headers": dict(r.headers),
+                "text": text,
+                "time": time.time(),
+            }
+        key = request_key(method, url, params, json)
+        self.archive.append(key, record["kind"], record)
+        return ArchivedResponse(record)
+
+
+class ReplaySession(_ArchiveSession):
+    """Answers requests from an Archive instead of the network.
+
+    Raises ArchiveMiss for a request that was never recorded.
+    """
+
+    def __init__(self, archive: Archive) -> None:
+        self.archive = archive
+
+    async def _send(
+        self, method: str, url: str, params=None, json=None, **kwargs
+    ) -> ArchivedResponse:
+        return ArchivedResponse(
+            self.archive.lookup(request_key(method, url, params, json))
+        )
+
+
+def replay_insurance_html(archive: Archive) -> Iterator[tuple[str, str]]:
+    """(car_id, html) of every archived insurance page, for parse_insurance_data."""
+    for record in archive.records("insurance"):
+        if record["status"] == 200:
+            yield URL(record["url"]).query.get("carid", ""), record["text"]
+
+
+def replay_notion_pages(
+    archive: Archive, db_id: str | None = None
+) -> Iterator[list[dict[str, Any]]]:
+    """The results of every archived database query, for extract_specific_data."""
+    for record in archive.records("notion_query"):
+        if record["status"] != 200:
+            continue
+        if db_id is not None and f"/databases/{db_id}/" not in record["url"]:
+            continue
+        yield json.loads(record["text"]).get("results") or []
+
+
+async def replay_encar_vehicle_data(
+    archive: Archive, header: dict, query: str, target_vehicle: list
+) -> dict:
+    """get_encar_vehicle_data_async answered from the archive, without rate limits."""
+    return await encar_search.get_encar_vehicle_data_async(
+        header, query, target_vehicle, ReplaySession(archive), Unlimited()
+    )
@@ -0,0 +1,62 @@
+import argparse
+import glob
+import time
+from insurance_parser import BACKENDS, parse_insurance_data
+
+SAMPLE_PAGE = """<html><head><title>보험이력</title></head><body>
+<div class="header"><div class="summary">headline</div></div>
+<div class="rreport type1">
+  <div class="summary">
+    <table>
+      <tr><th>일반</th><td> 0회 </td><th>영업용</th><td>없음</td></tr>
+      <tr><th>번호/소유자</th><td>1회/ 2회</td><th>전손</th><td>없음</td></tr>
+      <tr><th>내차피해</th><td><span>1회</span> (1,234,000원)</td><th>타차가해</th><td>0회</td></tr>
+    </table>
+  </div>
+  %s
+</div></body></html>"""
+
+
+def load_pages(pattern: str) -> dict[str, str]:
+    pages = {}
+    for file_name in sorted(glob.glob(pattern)):
+        with open(file_name, "r", encoding="utf-8") as fp:
+            pages[file_name] = fp.read()
+    if not pages:
+        # Pad the synthetic page so it is closer to the size of a real one.
+        filler = "<div class='detail'><p>내역</p></div>" * 400
+        pages["synthetic"] = SAMPLE_PAGE % filler
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark insurance page parsers.")
+    parser.add_argument("pages", nargs="?", default="samples/insurance/*.html")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    named_pages = load_pages(args.pages)
+    pages = list(named_pages.values())
+    # BeautifulSoup is the reference every other backend must agree with.
+    expected = [parse_insurance_data(page, backend="bs4") for page in pages]
+    print(f"{len(pages)} page(s), {args.repeat} repeat(s)")
+    for backend in BACKENDS:
+        results = [parse_insurance_data(page, backend=backend) for page in pages]
+        mismatches = [
+            name
+            for name, result, want in zip(named_pages, results, expected)
+            if result != want
+        ]
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for page in pages:
+                parse_insurance_data(page, backend=backend)
+        elapsed = time.perf_counter() - started
+        rate = args.repeat * len(pages) / elapsed
+        print(f"{backend:>6}: {rate:10.1f} parses/s  mismatches={len(mismatches)}")
+        for name in mismatches:
+            print(f"        differs on {name}")
+
+
+if __name__ == "__main__":
+    main()
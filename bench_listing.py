@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import tracemalloc
+from listing import Listing, ListingColumns
+
+VEHICLE = ["현대", "그랜저", "그랜저 IG"]
+
+
+def make_response(count: int) -> str:
+    """A search response body; decoding it gives each car its own strings."""
+    rng = random.Random(count)
+    return json.dumps(
+        [
+            {
+                "Id": str(30_000_000 + i),
+                "Badge": rng.choice(["2.4", "3.0", "3.3"]),
+                "BadgeDetail": rng.choice(["익스클루시브", "프리미엄", "셀러브리티"]),
+                "Transmission": "오토",
+                "FuelType": rng.choice(["가솔린", "디젤", "가솔린+전기"]),
+                "Year": 201601 + rng.randrange(6) * 100,
+                "FormYear": str(2016 + rng.randrange(6)),
+                "Mileage": rng.randrange(200_000),
+                "Price": rng.randrange(1_000, 5_000),
+                "OfficeCityState": rng.choice(["서울", "경기", "부산", "인천"]),
+                "ModifiedDate": f"2026-10-{rng.randrange(1, 29):02d} 10:00:00.000 +09",
+            }
+            for i in range(count)
+        ],
+        ensure_ascii=False,
+    )
+
+
+def as_dict(car: dict, target_vehicle: list) -> dict:
+    """The record get_encar_vehicle_data used to build."""
+    return {
+        "Badge": car.get("Badge", ""),
+        "BadgeDetail": car.get("BadgeDetail", ""),
+        "Transmission": car.get("Transmission", ""),
+        "FuelType": car.get("FuelType", ""),
+        "Year": car.get("Year", ""),
+        "FormYear": car.get("FormYear", ""),
+        "Mileage": car.get("Mileage", ""),
+        "Price": car.get("Price", ""),
+        "OfficeCityState": car.get("OfficeCityState", ""),
+        "ModifiedDate": car.get("ModifiedDate", ""),
+        "Availability": 1,
+        "InsuranceInspection": -1,
+        "Maker": target_vehicle[0],
+        "Model": target_vehicle[1],
+        "Submodel": target_vehicle[2],
+    }
+
+
+def measure(label: str, build, body: str) -> tuple[int, object]:
+    """Bytes still allocated by build's result once the decoded input is gone."""
+    tracemalloc.start()
+    cars = json.loads(body)
+    result = build(cars)
+    del cars
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark listing record memory.")
+    parser.add_argument("--cars", type=int, default=100_000)
+    args = parser.parse_args()
+
+    body = make_response(args.cars)
+    builds = {
+        "dict": lambda cars: {car["Id"]: as_dict(car, VEHICLE) for car in cars},
+        "Listing": lambda cars: {
+            car["Id"]: Listing.from_search_result(car, VEHICLE) for car in cars
+        },
+        "columns": lambda cars: ListingColumns.from_listings(
+            {car["Id"]: as_dict(car, VEHICLE) for car in cars}
+        ),
+    }
+    print(f"{args.cars} cars")
+    sizes = {}
+    for label, build in builds.items():
+        sizes[label], result = measure(label, build, body)
+        del result
+    for label, size in sizes.items():
+        print(
+            f"{label:>8}: {size / args.cars:8.0f} bytes/car"
+            f"  ({sizes['dict'] / size:.1f}x smaller)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+from payload_generator import (
+    VARIABLE_PROPERTY_NAMES,
+    VARIABLE_TYPES,
+    CompiledPayloadGenerator,
+    PayloadGenerator,
+)
+
+
+def make_rows(count: int) -> list[dict]:
+    return [
+        {
+            "availability": "✅True",
+            "maker": "현대",
+            "model": "그랜저",
+            "submodel": "그랜저 IG",
+            "mileage": 30_000 + i,
+            "price": 25_000_000 + i * 10_000,
+            "comment": f"{2600 + i}→{2500 + i}",
+            "year": 202001,
+            "location": "서울",
+            "transmission": "오토",
+            "badge_detail": "익스클루시브",
+        }
+        for i in range(count)
+    ]
+
+
+def measure(label: str, generate, rows: list[dict], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        generate(rows)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:>9}: {len(rows) / best:12.0f} rows/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Notion payload generators.")
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    current = PayloadGenerator(VARIABLE_PROPERTY_NAMES, VARIABLE_TYPES)
+    compiled = CompiledPayloadGenerator(VARIABLE_PROPERTY_NAMES, VARIABLE_TYPES)
+    if [current.generate(row) for row in rows] != compiled.generate_many(rows):
+        raise SystemExit("Compiled payloads differ from PayloadGenerator output")
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    slow = measure(
+        "current", lambda rows: [current.generate(r) for r in rows], rows, args.repeat
+    )
+    fast = measure("compiled", compiled.generate_many, rows, args.repeat)
+    print(f"  speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
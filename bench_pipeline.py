@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import re
+import statistics
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+import aiohttp
+from change_set import ChangeSet
+from encar_insurance import check_insurance, inspection_status
+from encar_search import get_encar_vehicle_data_async, get_query
+from fingerprint import check_updates_by_fingerprint
+from metrics import metrics
+from mock_server import MockServer, redirect
+from notion_api import create_notion_pages, iter_notion_records
+from notion_schema import AVAILABILITY_STATUSES
+from notion_writer import NotionWriteEngine
+from pipeline import run_pipeline
+from rate_limiter import TokenBucket
+from reconcile import reconcile
+
+VEHICLE = ["현대", "그랜저", "그랜저 IG"]
+HEADER = {"User-Agent": "bench"}
+API_KEY = "secret_bench"
+CONDITIONS = {"irreparable": ("==", 0), "self_damage": ("<=", 1)}
+_ID = re.compile(r"/[0-9a-f]{8}-[0-9a-f-]{27}")
+
+
+def _tracer(latencies: dict[str, list[float]]) -> aiohttp.TraceConfig:
+    """Records the client-side latency of every request, by endpoint."""
+
+    async def on_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_end(session, context, params):
+        endpoint = f"{params.method} {_ID.sub('/{id}', params.url.path)}"
+        latencies[endpoint].append(time.perf_counter() - context.started)
+
+    trace = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    return trace
+
+
+async def run_cycle(server: MockServer, args: argparse.Namespace) -> dict:
+    """One crawl -> reconcile -> insurance -> Notion sync cycle."""
+    latencies = defaultdict(list)
+    timings = {}
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(
+        connector=connector, trace_configs=[_tracer(latencies)]
+    ) as session:
+        started = time.perf_counter()
+        limiter = TokenBucket(args.encar_rps, args.connections)
+        cars = await get_encar_vehicle_data_async(
+            HEADER, get_query(*VEHICLE), VEHICLE, session, limiter
+        )
+        db_data = {}
+        async for batch in iter_notion_records(session, API_KEY, server.database_id):
+            db_data.update(batch)
+        timings["crawl"] = time.perf_counter() - started
+
+        stage = time.perf_counter()
+        result = reconcile(db_data, cars)
+        changes = ChangeSet()
+        changes.update_targets(
+            check_updates_by_fingerprint(result.intersection, cars, db_data)
+        )
+        changes.update_many(
+            result.newly_unavailable_page_ids,
+            {"availability": AVAILABILITY_STATUSES[0]},
+            "unavailable",
+        )
+        timings["reconcile"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        insurance = await check_insurance(
+            HEADER,
+            result.new,
+            CONDITIONS,
+            concurrency=args.connections,
+            backoff_seconds=0.05,
+            session=session,
+        )
+        timings["insurance"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        new_cars = {
+            car_id: cars[car_id].replace(
+                InsuranceInspection=inspection_status(insurance[car_id])
+            )
+            for car_id in result.new
+        }
+        async with NotionWriteEngine(
+            API_KEY, args.notion_rps, args.connections, backoff_seconds=0.05, session=session
+        ) as engine:
+            await asyncio.gather(
+                create_notion_pages(API_KEY, server.database_id, new_cars, engine=engine),
+                changes.apply(API_KEY, engine=engine),
+            )
+            report = engine.report()
+        timings["sync"] = time.perf_counter() - stage
+        timings["total"] = time.perf_counter() - started
+    return {
+        "cars": len(cars),
+        "new": len(result.new),
+        "updated": len(changes),
+        "timings": timings,
+        "latencies": latencies,
+        "writes": report,
+    }
+
+
+async def run_pipelined(server: MockServer, args: argparse.Namespace) -> dict:
+    """The same cycle through pipeline.run_pipeline's overlapping stages."""
+    latencies = defaultdict(list)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(
+        connector=connector, trace_configs=[_tracer(latencies)]
+    ) as session:
+        started = time.perf_counter()
+        async with NotionWriteEngine(
+            API_KEY, args.notion_rps, args.connections, backoff_seconds=0.05, session=session
+        ) as engine:
+            result = await run_pipeline(
+                API_KEY,
+                server.database_id,
+                HEADER,
+                get_query(*VEHICLE),
+                VEHICLE,
+                CONDITIONS,
+                session=session,
+                limiter=TokenBucket(args.encar_rps, args.connections),
+                engine=engine,
+                insurance_workers=args.connections,
+                create_workers=args.connections,
+                backoff_seconds=0.05,
+            )
+        total = time.perf_counter() - started
+    return {
+        "cars": len(result.cars),
+        "new": len(result.created),
+        "updated": len(result.updated),
+        "timings": {"total": total},
+        "latencies": latencies,
+        "writes": result.writes,
+    }
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def print_report(server: MockServer, stats: dict) -> None:
+    total = stats["timings"]["total"]
+    print(
+        f"{stats['cars']} cars in {total:.2f}s ({stats['cars'] / total:.0f} cars/s); "
+        f"{stats['new']} created, {stats['updated']} updated"
+    )
+    print("  " + "  ".join(f"{k}={v:.2f}s" for k, v in stats["timings"].items()))
+    print(f"  {'endpoint':<34} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for endpoint, values in sorted(stats["latencies"].items()):
+        print(
+            f"  {endpoint:<34} {len(values):>8} "
+            f"{_percentile(values, 50) * 1000:>8.1f} {_percentile(values, 99) * 1000:>8.1f}"
+        )
+    print(
+        f"  {server.requests} requests served, {server.counts['429']} rate limited, "
+        f"{server.requests / stats['cars']:.2f} requests/car"
+    )
+    print(f"  writes: {stats['writes']}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    server = MockServer(
+        args.size,
+        args.latency,
+        args.rate_limit_ratio,
+        retry_after=args.retry_after,
+        rate_limited_paths=tuple(args.rate_limited_paths),
+    )
+    if args.metrics:
+        metrics.enable()
+    base_url = await server.start()
+    try:
+        with redirect(base_url):
+            cycle = run_pipelined if args.mode == "pipeline" else run_cycle
+            stats = await cycle(server, args)
+    finally:
+        await server.stop()
+    print_report(server, stats)
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"  metrics written to {args.metrics}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end crawl/reconcile/sync benchmark against a local mock."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["staged", "pipeline"],
+        default="staged",
+        help="stage after stage, or run_pipeline's overlapping stages",
+    )
+    parser.add_argument("--size", type=int, default=2_000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.01)
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    parser.add_argument(
+        "--rate-limited-paths",
+        nargs="+",
+        default=["/v1/pages"],
+        help="path prefixes that get 429s, e.g. /v1/ for every Notion call",
+    )
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--encar-rps", type=float, default=200.0)
+    parser.add_argument("--notion-rps", type=float, default=300.0)
+    parser.add_argument(
+        "--metrics", help="write run metrics here (.prom for Prometheus text, else JSON)"
+    )
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import random
+import time
+from notion_api import get_page_ids_from_formatted_db
+from reconcile import reconcile
+from utils import find_ids_by_status, identify_differences
+
+
+def make_data(size: int) -> tuple[dict, dict]:
+    """A snapshot and a sweep overlapping by 80%, with a tenth marked unavailable."""
+    rng = random.Random(size)
+    ids = rng.sample(range(10_000_000, 90_000_000), size + size // 5)
+    db_data = {
+        str(car_id): {
+            "page_id": f"page-{car_id}",
+            "availability": car_id % 10 != 0,
+            "price": 30_000_000,
+        }
+        for car_id in ids[:size]
+    }
+    api_data = {str(car_id): {"Price": 3000} for car_id in ids[size // 5 :]}
+    return db_data, api_data
+
+
+def current(db_data: dict, api_data: dict) -> tuple:
+    new, intersection, unavailable = identify_differences(list(db_data), list(api_data))
+    _, relisted = find_ids_by_status(intersection, db_data, True)
+    newly_unavailable, _ = find_ids_by_status(unavailable, db_data, True)
+    return (
+        new,
+        intersection,
+        unavailable,
+        get_page_ids_from_formatted_db(relisted, db_data),
+        get_page_ids_from_formatted_db(newly_unavailable, db_data),
+    )
+
+
+def hashed(db_data: dict, api_data: dict) -> tuple:
+    result = reconcile(db_data, api_data)
+    return (
+        result.new,
+        result.intersection,
+        result.unavailable,
+        result.relisted_page_ids,
+        result.newly_unavailable_page_ids,
+    )
+
+
+def measure(function, db_data: dict, api_data: dict, repeat: int) -> tuple[float, tuple]:
+    best, output = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = function(db_data, api_data)
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot reconciliation.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'ids':>9} {'current':>10} {'hashed':>10} {'speedup':>8}")
+    for size in args.sizes:
+        db_data, api_data = make_data(size)
+        slow, expected = measure(current, db_data, api_data, args.repeat)
+        fast, output = measure(hashed, db_data, api_data, args.repeat)
+        if [sorted(part) for part in expected] != [sorted(part) for part in output]:
+            raise SystemExit(f"Partitions differ at {size} ids")
+        print(f"{size:>9} {slow * 1000:>8.1f}ms {fast * 1000:>8.1f}ms {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
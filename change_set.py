@@ -0,0 +1,126 @@
+import asyncio
+from typing import Any, Iterable
+from journal import Journal, journaled, update_key
+from notion_writer import NotionWriteEngine, write_engine
+from payload_generator import PAYLOAD_GENERATOR
+
+# When two sources set the same field of a page to different values, the one
+# listed first wins; sources not listed rank below these, ordered by name.
+SOURCE_PRECEDENCE = ("unavailable", "intersection", "insurance")
+
+
+def _rank(source: str) -> tuple[int, str]:
+    if source in SOURCE_PRECEDENCE:
+        return SOURCE_PRECEDENCE.index(source), ""
+    return len(SOURCE_PRECEDENCE), source
+
+
+class ChangeSet:
+    """Every pending mutation of a run, merged into one PATCH per page.
+
+    Trashing a page wins over any update queued for it, and field conflicts
+    are settled by SOURCE_PRECEDENCE, so the outcome never depends on the
+    order in which stages queued their changes.
+    """
+
+    def __init__(self) -> None:
+        self._fields: dict[str, dict[str, tuple[Any, str]]] = {}
+        self._trash: dict[str, str] = {}
+        self.mutations = 0
+
+    def update(self, page_id: str, changes: dict[str, Any], source: str) -> None:
+        self.mutations += 1
+        fields = self._fields.setdefault(page_id, {})
+        for name, value in changes.items():
+            current = fields.get(name)
+            if current is None or _rank(source) < _rank(current[1]):
+                fields[name] = (value, source)
+
+    def update_many(
+        self, page_ids: Iterable[str], changes: dict[str, Any], source: str
+    ) -> None:
+        for page_id in page_ids:
+            self.update(page_id, changes, source)
+
+    def update_targets(
+        self, update_targets: dict[str, dict[str, Any]], source: str = "intersection"
+    ) -> None:
+        """Queues the output of check_updates_for_intersection or its fingerprint twin."""
+        for page_id, changes in update_targets.items():
+            self.update(page_id, changes, source)
+
+    def trash(self, page_ids: Iterable[str], source: str = "expired") -> None:
+        for page_id in page_ids:
+            self.mutations += 1
+            self._trash.setdefault(page_id, source)
+
+    def plan(self) -> tuple[dict[str, dict[str, Any]], list[str]]:
+        """Returns the resolved (updates by page_id, page_ids to trash)."""
+        updates = {
+            page_id: {name: value for name, (value, _) in fields.items()}
+            for page_id, fields in sorted(self._fields.items())
+            if page_id not in self._trash and fields
+        }
+        return updates, sorted(self._trash)
+
+    def __len__(self) -> int:
+        updates, trash = self.plan()
+        return len(updates) + len(trash)
+
+    def diff(self) -> list[str]:
+        """Dry run: one line per field that would be written, nothing is sent."""
+        lines = []
+        for page_id in self.plan()[0]:
+            for name, (value, source) in sorted(self._fields[page_id].items()):
+                lines.append(f"~ {page_id} {name} = {value!r} ({source})")
+        for page_id, source in sorted(self._trash.items()):
+            dropped = len(self._fields.get(page_id, {}))
+            note = f", drops {dropped} queued field(s)" if dropped else ""
+            lines.append(f"- {page_id} trash ({source}{note})")
+        lines.append(f"{self.mutations} mutation(s) -> {len(self)} request(s)")
+        return lines
+
+    async def apply(
+        self,
+        api_key: str,
+        store=None,
+        engine: NotionWriteEngine | None = None,
+        journal: Journal | None = None,
+    ) -> dict[str, str | int]:
+        """With a journal, writes it has already applied this run are skipped."""
+        updates, trash = self.plan()
+        payloads = {
+            page_id: PAYLOAD_GENERATOR.generate(fields)
+            for page_id, fields in updates.items()
+        }
+        if journal is not None:
+            journal.plan(
+                "update",
+                [update_key(page_id, payload) for page_id, payload in payloads.items()],
+            )
+            journal.plan("trash", trash)
+        async with write_engine(api_key, store, engine) as engine:
+            tasks = [
+                *(
+                    journaled(
+                        journal,
+                        "update",
+                        update_key(page_id, payload),
+                        lambda on_send, page_id=page_id, payload=payload: (
+                            engine.update_page(page_id, payload)
+                        ),
+                    )
+                    for page_id, payload in payloads.items()
+                ),
+                *(
+                    journaled(
+                        journal,
+                        "trash",
+                        page_id,
+                        lambda on_send, page_id=page_id: engine.trash_page(page_id),
+                    )
+                    for page_id in trash
+                ),
+            ]
+            results = await asyncio.gather(*tasks)
+        return dict(zip([*payloads, *trash], results))
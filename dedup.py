@@ -0,0 +1,163 @@
+from collections import defaultdict
+from typing import Any, Mapping
+
+# Mileage re-read between two listings of the same car, in km.
+DEFAULT_MILEAGE_TOLERANCE = 1_000
+# Largest price change, as a fraction, between a car and its re-listing.
+DEFAULT_PRICE_TOLERANCE = 0.1
+# Below this mileage, identical listings are usually a dealer's new cars of
+# one trim rather than one car listed twice, so they are never merged.
+MIN_DUPLICATE_MILEAGE = 100
+
+
+def _id_order(car_id: str) -> tuple[int, str]:
+    """Numeric order for Encar's digit-string IDs."""
+    return len(car_id), car_id
+
+
+def _to_int(value: Any) -> int | None:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class ListingIndex:
+    """Listings bucketed by (year, form year, badge detail, mileage, location).
+
+    Exact duplicates, which also share their price, are found with one dict
+    lookup. Mileage buckets are as wide as the tolerance, so every candidate
+    for a tolerant match lies in a listing's own bucket or one of its two
+    neighbours.
+    """
+
+    def __init__(
+        self,
+        mileage_tolerance: int = DEFAULT_MILEAGE_TOLERANCE,
+        price_tolerance: float = DEFAULT_PRICE_TOLERANCE,
+    ) -> None:
+        self.mileage_tolerance = mileage_tolerance
+        self.price_tolerance = price_tolerance
+        self._width = max(mileage_tolerance, 1)
+        self._buckets: dict[tuple, list[tuple[str, int | None, int | None]]] = (
+            defaultdict(list)
+        )
+        self._exact: dict[tuple, str] = {}
+        self._bucket_of: dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._bucket_of)
+
+    def _identity(self, car: Mapping[str, Any]) -> tuple:
+        return (
+            _to_int(car.get("Year")),
+            _to_int(car.get("FormYear")),
+            car.get("BadgeDetail") or "",
+            car.get("OfficeCityState") or "",
+        )
+
+    def _keys(self, car: Mapping[str, Any], mileage: int | None) -> list[tuple]:
+        identity = self._identity(car)
+        if mileage is None:
+            return [(*identity, None)]
+        bucket = mileage // self._width
+        return [(*identity, bucket + offset) for offset in (0, -1, 1)]
+
+    def _exact_key(self, car: Mapping[str, Any], mileage: int | None) -> tuple | None:
+        if mileage is None or mileage < MIN_DUPLICATE_MILEAGE:
+            return None
+        return (*self._identity(car), mileage, _to_int(car.get("Price")))
+
+    def add(self, car_id: str, car: Mapping[str, Any]) -> str | None:
+        """Index a listing; when it duplicates one, return the car_id to drop.
+
+        A duplicate has the same identity, price and exact mileage. Of two
+        duplicates the smaller car_id is kept whichever is added first, so
+        crawls that see them in a different order keep the same one; the
+        other is returned, which may be car_id itself. Listings without a
+        mileage or with less than MIN_DUPLICATE_MILEAGE are always indexed.
+        """
+        if car_id in self._bucket_of:
+            return None
+        mileage = _to_int(car.get("Mileage"))
+        exact_key = self._exact_key(car, mileage)
+        dropped = None
+        if exact_key is not None:
+            original = self._exact.setdefault(exact_key, car_id)
+            if original != car_id:
+                if _id_order(original) < _id_order(car_id):
+                    return car_id
+                self._exact[exact_key] = car_id
+                self._unindex(original)
+                dropped = original
+        bucket_key = self._keys(car, mileage)[0]
+        self._bucket_of[car_id] = bucket_key
+        self._buckets[bucket_key].append((car_id, mileage, _to_int(car.get("Price"))))
+        return dropped
+
+    def _unindex(self, car_id: str) -> None:
+        entries = self._buckets[self._bucket_of.pop(car_id)]
+        for i, entry in enumerate(entries):
+            if entry[0] == car_id:
+                del entries[i]
+                return
+
+    def remove(self, car_id: str, car: Mapping[str, Any]) -> None:
+        if car_id not in self._bucket_of:
+            return
+        exact_key = self._exact_key(car, _to_int(car.get("Mileage")))
+        if exact_key is not None and self._exact.get(exact_key) == car_id:
+            del self._exact[exact_key]
+        self._unindex(car_id)
+
+    def find_match(self, car: Mapping[str, Any]) -> str | None:
+        """The closest indexed listing within the mileage and price tolerances."""
+        mileage = _to_int(car.get("Mileage"))
+        price = _to_int(car.get("Price"))
+        best, best_distance = None, None
+        for key in self._keys(car, mileage):
+            for car_id, indexed_mileage, indexed_price in self._buckets.get(key, ()):
+                if mileage is None or indexed_mileage is None:
+                    mileage_gap = 0 if mileage == indexed_mileage else None
+                else:
+                    mileage_gap = abs(mileage - indexed_mileage)
+                if mileage_gap is None or mileage_gap > self.mileage_tolerance:
+                    continue
+                if price and indexed_price:
+                    price_gap = abs(price - indexed_price) / indexed_price
+                    if price_gap > self.price_tolerance:
+                        continue
+                else:
+                    price_gap = 0.0
+                distance = (mileage_gap, price_gap)
+                if best_distance is None or distance < best_distance:
+                    best, best_distance = car_id, distance
+        return best
+
+
+def link_relistings(
+    cars: Mapping[str, Mapping[str, Any]],
+    previous: Mapping[str, Mapping[str, Any]],
+    mileage_tolerance: int = DEFAULT_MILEAGE_TOLERANCE,
+    price_tolerance: float = DEFAULT_PRICE_TOLERANCE,
+) -> dict[str, str]:
+    """Map each new car_id in cars to the vanished previous listing it re-lists.
+
+    Each vanished listing is linked at most once.
+    """
+    index = ListingIndex(mileage_tolerance, price_tolerance)
+    for car_id, car in previous.items():
+        if car_id not in cars:
+            index.add(car_id, car)
+    links = {}
+    if not index:
+        return links
+    for car_id, car in cars.items():
+        if car_id in previous:
+            continue
+        match = index.find_match(car)
+        if match is not None:
+            links[car_id] = match
+            index.remove(match, previous[match])
+    return links
+
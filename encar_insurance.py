@@ -1,88 +1,211 @@
 import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any
 import aiohttp
-from bs4 import BeautifulSoup
-
-
-def check_conditions(car_history, **conditions):
-    if car_history == "조회불가차량" or car_history is None:
-        return False
-    lambdas = {
-        "==": lambda a, b: a == b,
-        "!=": lambda a, b: a != b,
-        "<=": lambda a, b: a <= b,
-        ">=": lambda a, b: a >= b,
-    }
-    allowed_keys = [
-        "general",
-        "business_use",
-        "plate_and_owner",
-        "irreparable",
-        "self_damage",
-        "third_party_damage",
-        "plate_changed",
-        "owner_changed",
-    ]
-    disallowed = [key for key in conditions.keys() if key not in allowed_keys]
-    if disallowed:
-        return "Wrong key(s) for condition check"
-    for k, v in conditions.items():
-        operator, condition = v
-        if operator not in lambdas:
-            return "Wrong operator(s)"
-        if not lambdas[operator](car_history[k], condition):
-            return False
-    return True
-
-
-def parse_insurance_data(html):
-    soup = BeautifulSoup(html, "html.parser")
-    try:
-        summary = (
-            soup.find("div", class_="rreport")
-            .find("div", class_="summary")
-            .find_all("td")
-        )
-        if summary is None:
-            return "No data"
-
-        titles = [
-            "general",
-            "business_use",
-            "plate_and_owner",
-            "irreparable",
-            "self_damage",
-            "third_party_damage",
-        ]
-        values = [i.text.strip() for i in summary if i.text]
-        combined = dict(zip(titles, values))
-
-        plate_changed, owner_changed = (
-            combined.pop("plate_and_owner").strip().replace("회", "").split("/")
-        )
-        combined.update(
-            {"plate_changed": int(plate_changed), "owner_changed": int(owner_changed)}
+from insurance_cache import InsuranceCache
+from insurance_filter import compile_conditions
+from insurance_parser import parse_insurance_data
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INSURANCE_URL = "http://www.encar.com/dc/dc_cardetailview.do?method=kidiFirstPop&carid="
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+def inspection_status(result: dict[str, Any]) -> int:
+    """The InsuranceInspection value of a check: -1 (pending) when the fetch failed."""
+    if not result["fetched"]:
+        return -1
+    return int(result["passed"])
+
+
+def check_conditions(car_history, **conditions) -> bool:
+    """Raises ConditionError on a bad spec; compile_conditions once for batches."""
+    return compile_conditions(conditions)(car_history)
+
+
+async def fetch_insurance_html_async(session, header: dict, car_id) -> str:
+    history_url = f"{INSURANCE_URL}{car_id}"
+    with metrics.time("request_seconds", endpoint="insurance"):
+        async with session.get(history_url, headers=header) as response:
+            metrics.inc("requests", endpoint="insurance", status=response.status)
+            body = await response.read()
+            metrics.inc("response_bytes", len(body), endpoint="insurance")
+            if response.status != 200:
+                raise ValueError(f"Failed to fetch data for car ID {car_id}")
+            logger.debug(
+                "Fetched insurance page",
+                extra={"stage": "insurance", "car_id": str(car_id)},
+            )
+            return await response.text()
+
+
+async def fetch_insurance_data_async(
+    session, header: dict, car_id, executor: Executor | None = None
+):
+    html_text = await fetch_insurance_html_async(session, header, car_id)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, parse_insurance_data, html_text)
+
+
+async def _fetch_with_retry(
+    session,
+    header: dict,
+    car_id,
+    semaphore: asyncio.Semaphore,
+    executor: Executor,
+    retries: int,
+    backoff_seconds: float,
+):
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                html_text = await fetch_insurance_html_async(session, header, car_id)
+            break
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            if attempt == retries:
+                raise
+            metrics.inc("retries", endpoint="insurance")
+            await asyncio.sleep(backoff_seconds * 2**attempt)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, parse_insurance_data, html_text)
+
+
+async def _fetch_histories(
+    session,
+    header: dict,
+    car_ids: list[str],
+    executor: Executor,
+    concurrency: int,
+    retries: int,
+    backoff_seconds: float,
+) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        _fetch_with_retry(
+            session, header, id, semaphore, executor, retries, backoff_seconds
         )
-        return combined
-    except Exception as exc:
-        return exc.__class__
-
-
-async def fetch_insurance_data_async(session, header: dict, car_id):
-    history_url = f"http://www.encar.com/dc/dc_cardetailview.do?method=kidiFirstPop&carid={car_id}"
-    async with session.get(history_url, headers=header) as response:
-        if response.status != 200:
-            raise ValueError(f"Failed to fetch data for car ID {car_id}")
-        html_text = await response.text()
-        return await parse_insurance_data(html_text)
-
-
-async def check_insurance(header: dict, car_ids: dict, conditions: dict):
-    async with aiohttp.ClientSession() as session:
-        tasks1 = [fetch_insurance_data_async(session, header, id) for id in car_ids]
-        result = await asyncio.gather(*tasks1)
-        tasks2 = [
-            check_conditions(car_history=history, conditions=conditions)
-            for history in result
-        ]
-        result2 = await asyncio.gather(*tasks2)
-        return result2
+        for id in car_ids
+    ]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class InsuranceChecker:
+    """check_insurance for one car at a time, for callers that stream car IDs.
+
+    Shares one semaphore, parser executor and cache across every check.
+    """
+
+    def __init__(
+        self,
+        session,
+        header: dict,
+        conditions: dict,
+        executor: Executor,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        cache: InsuranceCache | None = None,
+    ) -> None:
+        self.session = session
+        self.header = header
+        self.passes = compile_conditions(conditions)
+        self.executor = executor
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.cache = cache
+
+    async def check(self, car_id: str) -> dict[str, Any]:
+        """{"history": ..., "passed": bool, "fetched": bool} for one car.
+
+        fetched is False when the page could not be fetched after every
+        retry; passed is then False without the car having failed anything.
+        """
+        history = self.cache.get(car_id) if self.cache is not None else None
+        if self.cache is not None:
+            result = "miss" if history is None else "hit"
+            metrics.inc("cache_lookups", cache="insurance", result=result)
+        if history is None:
+            metrics.inc("records", stage="insurance")
+            try:
+                history = await _fetch_with_retry(
+                    self.session,
+                    self.header,
+                    car_id,
+                    self.semaphore,
+                    self.executor,
+                    self.retries,
+                    self.backoff_seconds,
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                return {"history": None, "passed": False, "fetched": False}
+            if self.cache is not None:
+                self.cache.set(car_id, history)
+        return {"history": history, "passed": self.passes(history), "fetched": True}
+
+
+async def check_insurance(
+    header: dict,
+    car_ids: dict,
+    conditions: dict,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    cache: InsuranceCache | None = None,
+    session=None,
+) -> dict[str, dict[str, Any]]:
+    """Returns {car_id: {"history": ..., "passed": bool, "fetched": bool}}.
+
+    fetched is False for the cars whose page could not be fetched.
+    """
+    passes = compile_conditions(conditions)
+    histories = {}
+    if cache is not None:
+        for car_id in car_ids:
+            cached = cache.get(car_id)
+            if cached is not None:
+                histories[car_id] = cached
+    to_fetch = [car_id for car_id in car_ids if car_id not in histories]
+    if cache is not None:
+        metrics.inc("cache_lookups", len(histories), cache="insurance", result="hit")
+        metrics.inc("cache_lookups", len(to_fetch), cache="insurance", result="miss")
+    metrics.inc("records", len(to_fetch), stage="insurance")
+
+    if to_fetch:
+        settings = (concurrency, retries, backoff_seconds)
+        with ProcessPoolExecutor() as executor:
+            if session is not None:
+                fetched = await _fetch_histories(
+                    session, header, to_fetch, executor, *settings
+                )
+            else:
+                async with aiohttp.ClientSession() as session:
+                    fetched = await _fetch_histories(
+                        session, header, to_fetch, executor, *settings
+                    )
+        for car_id, history in zip(to_fetch, fetched):
+            histories[car_id] = history
+            if cache is not None and not isinstance(history, BaseException):
+                cache.set(car_id, history)
+
+    if cache is not None:
+        cache.flush()
+        logger.info(f"Insurance cache: {cache.stats}", extra={"stage": "insurance"})
+
+    results = {}
+    for car_id in car_ids:
+        history = histories[car_id]
+        if isinstance(history, BaseException):
+            results[car_id] = {"history": None, "passed": False, "fetched": False}
+        else:
+            results[car_id] = {
+                "history": history,
+                "passed": passes(history),
+                "fetched": True,
+            }
+    return results
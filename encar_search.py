@@ -1,6 +1,16 @@
-import time
-import requests
-from config import get_delay_seconds
+import asyncio
+from typing import AsyncIterator
+import aiohttp
+from dedup import ListingIndex
+from listing import Listing
+from metrics import metrics
+from rate_limiter import Limiter, TokenBucket
+
+SEARCH_URL = "http://api.encar.com/search/car/list/premium?count=true&q="
+PAGE_SIZE = 100
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_BURST = 2
+DEFAULT_CONNECTIONS = 4
 
 
 def get_query(maker: str, model: str, submodel: str, **conditions: dict) -> str:
@@ -18,53 +28,147 @@ def get_query(maker: str, model: str, submodel: str, **conditions: dict) -> str:
     return default + closing
 
 
-def get_encar_vehicle_data(header: dict, query: str, target_vehicle: list) -> dict:
-    start = 0
-    increase_by = 100
-    search_url = "http://api.encar.com/search/car/list/premium?count=true&q="
-    sort_range = f"&sr=|PriceDesc|{start}|{increase_by}"
-    url = search_url + query + sort_range
+def _get_search_url(query: str, start: int, sort: str = "PriceDesc") -> str:
+    return SEARCH_URL + query + f"&sr=|{sort}|{start}|{PAGE_SIZE}"
+
+
+async def _fetch_search_page(
+    session,
+    header: dict,
+    query: str,
+    start: int,
+    limiter: Limiter,
+    sort: str = "PriceDesc",
+) -> dict:
+    await limiter.acquire()
+    with metrics.time("request_seconds", endpoint="encar_search"):
+        async with session.get(
+            _get_search_url(query, start, sort), headers=header
+        ) as r:
+            metrics.inc("requests", endpoint="encar_search", status=r.status)
+            body = await r.read()
+            metrics.inc("response_bytes", len(body), endpoint="encar_search")
+            r.raise_for_status()
+            return await r.json(content_type=None)
+
+
+def _collect_search_results(
+    fetched_cars: list[dict],
+    target_vehicle: list,
+    checked_cars_ids: dict,
+    listing_index: ListingIndex,
+) -> list[str]:
+    """Returns the IDs of earlier listings that a duplicate with a smaller ID replaced."""
+    metrics.inc("records", len(fetched_cars), stage="encar_search")
+    replaced = []
+    for car in fetched_cars:
+        car_id = car.get("Id", "")
+        dropped = listing_index.add(car_id, car)
+        if dropped == car_id:
+            continue
+        if dropped is not None:
+            checked_cars_ids.pop(dropped, None)
+            replaced.append(dropped)
+        checked_cars_ids[car_id] = Listing.from_search_result(car, target_vehicle)
+    return replaced
+
+
+async def _fetch_all_pages(
+    session, header: dict, query: str, limiter: Limiter
+) -> list[dict]:
+    # The Count probe is the first page itself, so it is never fetched twice.
+    first_page = await _fetch_search_page(session, header, query, 0, limiter)
+    remaining_cars = first_page.get("Count") or 0
+    tasks = [
+        _fetch_search_page(session, header, query, start, limiter)
+        for start in range(PAGE_SIZE, remaining_cars, PAGE_SIZE)
+    ]
+    return [first_page, *await asyncio.gather(*tasks)]
+
+
+async def iter_encar_vehicle_data(
+    session, header: dict, query: str, target_vehicle: list, limiter: Limiter
+) -> AsyncIterator[tuple[dict, list[str]]]:
+    """Yields (listings, replaced) for each search page as soon as it arrives.
+
+    Pages come in completion order; duplicates are dropped across all of them.
+    replaced holds the IDs of listings yielded with an earlier page that a
+    duplicate with a smaller ID on this page supersedes.
+    """
+    first_page = await _fetch_search_page(session, header, query, 0, limiter)
+    remaining_cars = first_page.get("Count") or 0
+    tasks = [
+        asyncio.ensure_future(_fetch_search_page(session, header, query, start, limiter))
+        for start in range(PAGE_SIZE, remaining_cars, PAGE_SIZE)
+    ]
+    listing_index = ListingIndex()
 
-    r = requests.get(url, headers=header)
-    if r.status_code != 200:
-        return r.raise_for_status()
-    remaining_cars = r.json().get("Count")
+    def collect(page: dict) -> tuple[dict, list[str]]:
+        cars = {}
+        replaced = _collect_search_results(
+            page.get("SearchResults") or [], target_vehicle, cars, listing_index
+        )
+        return cars, replaced
+
+    try:
+        yield collect(first_page)
+        for next_page in asyncio.as_completed(tasks):
+            yield collect(await next_page)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _collect_pages(pages: list[dict], target_vehicle: list) -> dict:
     checked_cars_ids = {}
-    duplicate_checks = set()
-
-    while remaining_cars > start:
-        sort_range = f"&sr=|PriceDesc|{start}|{increase_by}"
-        url = search_url + query + sort_range
-        time.sleep(get_delay_seconds())
-        r = requests.get(url, headers=header)
-        if r.status_code != 200:
-            return r.raise_for_status()
-        fetched_cars = r.json().get("SearchResults")
-        for car in fetched_cars:
-            car_id = car.get("Id", "")
-            mileage = car.get("Mileage", "")
-            price = car.get("Price", "")
-            mileage_price = f"{mileage}_{price}"
-            
-            if mileage_price not in duplicate_checks:
-                duplicate_checks.add(mileage_price)
-                checked_cars_ids[car_id] = {
-                    "Badge": car.get("Badge", ""),
-                    "BadgeDetail": car.get("BadgeDetail", ""),
-                    "Transmission": car.get("Transmission", ""),
-                    "FuelType": car.get("FuelType", ""),
-                    "Year": car.get("Year", ""),
-                    "FormYear": car.get("FormYear", ""),
-                    "Mileage": mileage,
-                    "Price": price,
-                    "OfficeCityState": car.get("OfficeCityState", ""),
-                    "ModifiedDate": car.get("ModifiedDate", ""),
-                    "Availability": 1,
-                    "InsuranceInspection": -1,
-                    "Maker": target_vehicle[0],
-                    "Model": target_vehicle[1],
-                    "Submodel": target_vehicle[2],
-                }
-        start += increase_by
-
-    return checked_cars_ids
\ No newline at end of file
+    listing_index = ListingIndex()
+    for page in pages:
+        _collect_search_results(
+            page.get("SearchResults") or [],
+            target_vehicle,
+            checked_cars_ids,
+            listing_index,
+        )
+    return checked_cars_ids
+
+
+async def _crawl_vehicle_data(
+    session, header: dict, query: str, target_vehicle: list, limiter: Limiter
+) -> dict:
+    pages = await _fetch_all_pages(session, header, query, limiter)
+    return _collect_pages(pages, target_vehicle)
+
+
+async def get_encar_vehicle_data_async(
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    session=None,
+    limiter: Limiter | None = None,
+) -> dict:
+    """Fetch every search page of a query concurrently under a shared rate limit."""
+    if limiter is None:
+        limiter = TokenBucket(DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST)
+    if session is not None:
+        return await _crawl_vehicle_data(
+            session, header, query, target_vehicle, limiter
+        )
+    connector = aiohttp.TCPConnector(limit=DEFAULT_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await _crawl_vehicle_data(
+            session, header, query, target_vehicle, limiter
+        )
+
+
+def get_encar_vehicle_data(
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+) -> dict:
+    """The crawl as plain dicts; the async API returns Listing objects."""
+    limiter = TokenBucket(requests_per_second, DEFAULT_BURST)
+    cars = asyncio.run(
+        get_encar_vehicle_data_async(header, query, target_vehicle, limiter=limiter)
+    )
+    return {car_id: car.to_dict() for car_id, car in cars.items()}
@@ -0,0 +1,83 @@
+import hashlib
+from typing import Any, Iterable, Mapping
+from notion_schema import AVAILABILITY_STATUSES, TRACKED_FIELDS
+
+_TRACKED = tuple(
+    (field.variable, field.source, field.to_notion) for field in TRACKED_FIELDS
+)
+
+
+def _normalize(value: Any) -> Any:
+    """Blank text is None and integral floats are ints, on either side."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def listing_values(car_data: Mapping[str, Any]) -> dict[str, Any]:
+    """Tracked fields of an Encar listing, as the Notion page would store them."""
+    values = {}
+    for variable, source, to_notion in _TRACKED:
+        value = car_data.get(source)
+        if value is not None and to_notion is not None:
+            value = to_notion(value)
+        values[variable] = _normalize(value)
+    return values
+
+
+def record_values(record: Mapping[str, Any]) -> dict[str, Any]:
+    """Tracked fields of an extract_specific_data record."""
+    return {variable: _normalize(record.get(variable)) for variable, _, _ in _TRACKED}
+
+
+def fingerprint(values: Mapping[str, Any]) -> str:
+    content = repr(tuple(values[variable] for variable, _, _ in _TRACKED))
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+def record_fingerprint(record: Mapping[str, Any]) -> str:
+    """The stored fingerprint, or one computed from the record's fields."""
+    return record.get("fingerprint") or fingerprint(record_values(record))
+
+
+def check_updates_by_fingerprint(
+    intersection: Iterable[str],
+    api_data: Mapping[str, Mapping[str, Any]],
+    db_data: Mapping[str, Mapping[str, Any]],
+) -> dict[str, dict[str, Any]]:
+    """check_updates_for_intersection over every tracked field.
+
+    Cars whose listing fingerprint matches the snapshot's are skipped without
+    a field comparison; the others get one entry per field that differs.
+    Price changes extend the comment as before.
+    """
+    changes = {}
+    for car_id in intersection:
+        record = db_data.get(car_id, {})
+        car_data = api_data.get(car_id, {})
+        page_id = record.get("page_id")
+        update = {}
+        # Car id found in the intersection indicates it's available in Encar
+        if not record.get("availability"):
+            update["availability"] = AVAILABILITY_STATUSES[1]
+        api_values = listing_values(car_data)
+        if fingerprint(api_values) != record_fingerprint(record):
+            db_values = record_values(record)
+            for variable, value in api_values.items():
+                if value is not None and value != db_values[variable]:
+                    update[variable] = value
+            if "price" in update and db_values["price"] is not None:
+                api_price = int(update["price"] / 10_000)
+                db_price = int(db_values["price"] / 10_000)
+                db_comment = record.get("comment")
+                update["comment"] = (
+                    db_comment + f"→{api_price}"
+                    if db_comment
+                    else f"{db_price}→{api_price}"
+                )
+        if update:
+            changes[page_id] = update
+    return changes
@@ -0,0 +1,177 @@
+import os
+from typing import Any
+import aiohttp
+from dedup import ListingIndex, link_relistings
+from encar_search import (
+    DEFAULT_BURST,
+    DEFAULT_CONNECTIONS,
+    DEFAULT_REQUESTS_PER_SECOND,
+    PAGE_SIZE,
+    _collect_pages,
+    _collect_search_results,
+    _fetch_all_pages,
+    _fetch_search_page,
+)
+from listing import Listing
+from rate_limiter import Limiter, TokenBucket
+from utils import read_file, write_file
+
+
+class WatermarkStore:
+    """Per-query Count/ModifiedDate watermarks with the listing they describe."""
+
+    def __init__(self, file_name: str = "watermarks.json") -> None:
+        self.file_name = file_name
+        self._marks = read_file(file_name) if os.path.exists(file_name) else {}
+        for mark in self._marks.values():
+            mark["cars"] = {
+                car_id: Listing(**car) for car_id, car in mark["cars"].items()
+            }
+
+    def get(self, query: str) -> dict[str, Any] | None:
+        return self._marks.get(query)
+
+    def set(
+        self,
+        query: str,
+        count: int,
+        modified_date: str,
+        ids: set[str],
+        cars: dict[str, dict[str, Any]],
+        relisted: dict[str, str] | None = None,
+    ) -> None:
+        self._marks[query] = {
+            "count": count,
+            "modified_date": modified_date,
+            "ids": sorted(ids),
+            "cars": cars,
+            "relisted": relisted or {},
+        }
+
+    def relisted(self, query: str) -> dict[str, str]:
+        """New car_id -> vanished car_id links found by the latest crawl."""
+        return (self.get(query) or {}).get("relisted", {})
+
+    def save(self) -> None:
+        write_file(self.file_name, self._marks)
+
+
+def _newest_modified_date(results: list[dict], default: str = "") -> str:
+    return max((car.get("ModifiedDate") or "" for car in results), default=default)
+
+
+async def _full_crawl(
+    session,
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    limiter: Limiter,
+    watermarks: WatermarkStore,
+) -> dict:
+    pages = await _fetch_all_pages(session, header, query, limiter)
+    results = [car for page in pages for car in page.get("SearchResults") or []]
+    cars = _collect_pages(pages, target_vehicle)
+    mark = watermarks.get(query)
+    watermarks.set(
+        query,
+        count=pages[0].get("Count") or 0,
+        modified_date=_newest_modified_date(results),
+        ids={car.get("Id", "") for car in results},
+        cars=cars,
+        relisted=link_relistings(cars, mark["cars"]) if mark else None,
+    )
+    return cars
+
+
+async def _crawl_incremental(
+    session,
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    limiter: Limiter,
+    watermarks: WatermarkStore,
+) -> tuple[dict, bool]:
+    mark = watermarks.get(query)
+    if mark is None:
+        cars = await _full_crawl(
+            session, header, query, target_vehicle, limiter, watermarks
+        )
+        return cars, True
+
+    probe = await _fetch_search_page(
+        session, header, query, 0, limiter, sort="ModifiedDate"
+    )
+    count = probe.get("Count") or 0
+    watermark = mark["modified_date"]
+    if (
+        count == mark["count"]
+        and _newest_modified_date(probe.get("SearchResults") or []) <= watermark
+    ):
+        return mark["cars"], False
+
+    # Listings come newest first, so paging stops at the first one that is
+    # not newer than the watermark.
+    changed, page, start = [], probe, 0
+    while True:
+        results = page.get("SearchResults") or []
+        fresh = [car for car in results if (car.get("ModifiedDate") or "") > watermark]
+        changed.extend(fresh)
+        start += PAGE_SIZE
+        if len(fresh) < len(results) or start >= count:
+            break
+        page = await _fetch_search_page(
+            session, header, query, start, limiter, sort="ModifiedDate"
+        )
+
+    known_ids = set(mark["ids"])
+    changed_ids = {car.get("Id", "") for car in changed}
+    added_ids = changed_ids - known_ids
+    if count != mark["count"] + len(added_ids):
+        # Some listings disappeared; only a full listing tells which ones.
+        cars = await _full_crawl(
+            session, header, query, target_vehicle, limiter, watermarks
+        )
+        return cars, True
+
+    cars = {
+        car_id: car for car_id, car in mark["cars"].items() if car_id not in changed_ids
+    }
+    listing_index = ListingIndex()
+    for car_id, car in cars.items():
+        listing_index.add(car_id, car)
+    _collect_search_results(changed, target_vehicle, cars, listing_index)
+    watermarks.set(
+        query,
+        count=count,
+        modified_date=_newest_modified_date(changed, default=watermark),
+        ids=known_ids | added_ids,
+        cars=cars,
+    )
+    return cars, True
+
+
+async def get_encar_vehicle_data_incremental(
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    watermarks: WatermarkStore,
+    session=None,
+    limiter: Limiter | None = None,
+) -> tuple[dict, bool]:
+    """Return (cars, changed); an unchanged query costs a single probe request.
+
+    New and repriced listings are read from the ModifiedDate-sorted pages newer
+    than the watermark. A full crawl is only done for a query seen for the
+    first time or when the Count shows that listings were removed.
+    """
+    if limiter is None:
+        limiter = TokenBucket(DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST)
+    if session is not None:
+        return await _crawl_incremental(
+            session, header, query, target_vehicle, limiter, watermarks
+        )
+    connector = aiohttp.TCPConnector(limit=DEFAULT_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await _crawl_incremental(
+            session, header, query, target_vehicle, limiter, watermarks
+        )
@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Iterator
+
+UNAVAILABLE = "조회불가차량"
+DEFAULT_TTL = timedelta(days=30)
+DEFAULT_NEGATIVE_TTL = timedelta(days=7)
+DEFAULT_MAX_ENTRIES = 50_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS histories (
+    car_id TEXT PRIMARY KEY,
+    history TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_histories_accessed_at ON histories (accessed_at);
+"""
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"hits={self.hits} negative_hits={self.negative_hits} misses={self.misses}"
+        )
+
+
+class InsuranceCache:
+    """On-disk cache of parsed insurance histories with TTL and LRU eviction.
+
+    Parsed dicts live for ttl; the 조회불가차량 result is cached separately for
+    negative_ttl so unavailable cars are not re-fetched every run either.
+    Hits only note their access time in memory, so a cached run costs no
+    writes; flush() stores those times in one transaction, and close() or
+    an eviction does so too.
+    """
+
+    def __init__(
+        self,
+        file_name: str = "insurance_cache.db",
+        ttl: timedelta = DEFAULT_TTL,
+        negative_ttl: timedelta = DEFAULT_NEGATIVE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.conn = sqlite3.connect(file_name)
+        self.conn.executescript(_SCHEMA)
+        self.ttl = ttl.total_seconds()
+        self.negative_ttl = negative_ttl.total_seconds()
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._accessed: dict[str, float] = {}
+        (self._count,) = self.conn.execute("SELECT COUNT(*) FROM histories").fetchone()
+
+    def flush(self) -> None:
+        """Stores the access times of the hits since the last flush."""
+        if not self._accessed:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE histories SET accessed_at = ? WHERE car_id = ?",
+                [(now, car_id) for car_id, now in self._accessed.items()],
+            )
+        self._accessed.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def get(self, car_id: str) -> dict[str, Any] | str | None:
+        """Returns the cached history, UNAVAILABLE, or None on a miss."""
+        row = self.conn.execute(
+            "SELECT history, fetched_at FROM histories WHERE car_id = ?", (car_id,)
+        ).fetchone()
+        now = time.time()
+        if row is not None:
+            history = json.loads(row[0])
+            ttl = self.negative_ttl if history == UNAVAILABLE else self.ttl
+            if now - row[1] <= ttl:
+                self._accessed[car_id] = now
+                if history == UNAVAILABLE:
+                    self.stats.negative_hits += 1
+                else:
+                    self.stats.hits += 1
+                return history
+        self.stats.misses += 1
+        return None
+
+    def items(self) -> Iterator[tuple[str, dict[str, Any] | str]]:
+        """Every cached history regardless of age, without touching the stats."""
+        for car_id, history in self.conn.execute("SELECT car_id, history FROM histories"):
+            yield car_id, json.loads(history)
+
+    def set(self, car_id: str, history: dict[str, Any] | str) -> None:
+        """Caches parsed dicts and UNAVAILABLE; parse failures are never cached."""
+        if not isinstance(history, dict) and history != UNAVAILABLE:
+            return
+        now = time.time()
+        exists = self.conn.execute(
+            "SELECT 1 FROM histories WHERE car_id = ?", (car_id,)
+        ).fetchone()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO histories VALUES (?, ?, ?, ?)",
+                (car_id, json.dumps(history, ensure_ascii=False), now, now),
+            )
+        self._accessed.pop(car_id, None)
+        if exists is None:
+            self._count += 1
+        if self._count > self.max_entries:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Least recently used by the access times of this run as well.
+        self.flush()
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM histories WHERE car_id IN "
+                "(SELECT car_id FROM histories ORDER BY accessed_at LIMIT ?)",
+                (self._count - self.max_entries,),
+            )
+        self._count = self.max_entries
@@ -0,0 +1,176 @@
+import operator
+import re
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+}
+
+HISTORY_KEYS = (
+    "general",
+    "business_use",
+    "plate_and_owner",
+    "irreparable",
+    "self_damage",
+    "third_party_damage",
+    "plate_changed",
+    "owner_changed",
+)
+
+_COUNT = re.compile(r"\d[\d,]*")
+_NONE = "없음"
+
+
+class ConditionError(ValueError):
+    pass
+
+
+def to_count(value: Any) -> float:
+    """Reads the leading count of a summary cell such as "2회 (1,234,000원)"; NaN if none."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        if value.strip() == _NONE:
+            return 0.0
+        match = _COUNT.search(value)
+        if match:
+            return float(match.group(0).replace(",", ""))
+    return float("nan")
+
+
+@dataclass(frozen=True)
+class Condition:
+    key: str
+    operator: str
+    value: Any
+
+    @property
+    def numeric(self) -> bool:
+        return isinstance(self.value, (int, float))
+
+
+class HistoryColumns:
+    """A batch of parsed histories held column by column."""
+
+    def __init__(self, histories: Iterable[Any]) -> None:
+        histories = list(histories)
+        self.size = len(histories)
+        self.valid = [isinstance(history, dict) for history in histories]
+        self.columns = {
+            key: [
+                history.get(key) if isinstance(history, dict) else None
+                for history in histories
+            ]
+            for key in HISTORY_KEYS
+        }
+        self._counts: dict[str, Any] = {}
+
+    def counts(self, key: str):
+        """The column as floats, NaN where the cell has no count."""
+        if key not in self._counts:
+            values = map(to_count, self.columns[key])
+            self._counts[key] = (
+                np.fromiter(values, dtype=float, count=self.size)
+                if np is not None
+                else array("d", values)
+            )
+        return self._counts[key]
+
+
+class InsuranceFilter:
+    """A validated conditions spec that tests one history or a whole batch."""
+
+    def __init__(self, conditions: tuple[Condition, ...]) -> None:
+        self.conditions = conditions
+
+    def __call__(self, history: Any) -> bool:
+        if not isinstance(history, dict):
+            return False
+        for condition in self.conditions:
+            value = history.get(condition.key)
+            compare = OPERATORS[condition.operator]
+            if condition.numeric:
+                value = to_count(value)
+                if value != value:
+                    return False
+            elif value is None:
+                return False
+            if not compare(value, condition.value):
+                return False
+        return True
+
+    def mask(self, batch: HistoryColumns):
+        """Boolean mask over the batch; a NumPy array when NumPy is installed."""
+        if np is not None:
+            mask = np.array(batch.valid, dtype=bool)
+            for condition in self.conditions:
+                compare = OPERATORS[condition.operator]
+                if condition.numeric:
+                    counts = batch.counts(condition.key)
+                    mask &= ~np.isnan(counts) & compare(counts, condition.value)
+                else:
+                    column = batch.columns[condition.key]
+                    mask &= np.fromiter(
+                        (
+                            value is not None and compare(value, condition.value)
+                            for value in column
+                        ),
+                        dtype=bool,
+                        count=batch.size,
+                    )
+            return mask
+
+        mask = list(batch.valid)
+        for condition in self.conditions:
+            compare = OPERATORS[condition.operator]
+            if condition.numeric:
+                column = batch.counts(condition.key)
+                mask = [
+                    passed and value == value and compare(value, condition.value)
+                    for passed, value in zip(mask, column)
+                ]
+            else:
+                column = batch.columns[condition.key]
+                mask = [
+                    passed and value is not None and compare(value, condition.value)
+                    for passed, value in zip(mask, column)
+                ]
+        return mask
+
+
+def compile_conditions(spec: dict[str, Any]) -> InsuranceFilter:
+    """Compiles {"self_damage": ("<=", 2), ...}; raises ConditionError on a bad spec."""
+    conditions = []
+    for key, rule in spec.items():
+        if key not in HISTORY_KEYS:
+            raise ConditionError(f"Unknown condition key: {key!r}")
+        if not isinstance(rule, (tuple, list)) or len(rule) != 2:
+            raise ConditionError(f"Condition for {key!r} must be (operator, value)")
+        op, value = rule
+        if op not in OPERATORS:
+            raise ConditionError(f"Unknown operator for {key!r}: {op!r}")
+        conditions.append(Condition(key, op, value))
+    return InsuranceFilter(tuple(conditions))
+
+
+def screen_histories(
+    histories: dict[str, Any], conditions: InsuranceFilter | dict[str, Any]
+) -> dict[str, bool]:
+    """Re-screens many stored histories at once, e.g. after a criteria change."""
+    if not isinstance(conditions, InsuranceFilter):
+        conditions = compile_conditions(conditions)
+    car_ids = list(histories)
+    batch = HistoryColumns(histories[car_id] for car_id in car_ids)
+    return dict(zip(car_ids, map(bool, conditions.mask(batch))))
@@ -0,0 +1,122 @@
+import re
+from html import unescape
+from bs4 import BeautifulSoup
+from insurance_cache import UNAVAILABLE
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+TITLES = [
+    "general",
+    "business_use",
+    "plate_and_owner",
+    "irreparable",
+    "self_damage",
+    "third_party_damage",
+]
+
+_DIV_TAG = re.compile(r"<(/?)div\b([^>]*)>", re.IGNORECASE)
+_CLASS_ATTR = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_TD = re.compile(r"<td\b[^>]*>(.*?)</td\s*>", re.IGNORECASE | re.DOTALL)
+_TD_OPEN = re.compile(r"<td\b", re.IGNORECASE)
+_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_MARKUP = re.compile(r"<!--.*?-->|<[^>]*>", re.DOTALL)
+
+
+class SummaryNotFound(Exception):
+    pass
+
+
+def _open_div(html: str, class_name: str, start: int = 0) -> re.Match:
+    """Returns the opening tag of the first div at or after start carrying class_name."""
+    candidate = re.compile(
+        rf"<div\b[^>]*\bclass\s*=[^>]*\b{re.escape(class_name)}\b[^>]*>", re.IGNORECASE
+    )
+    for tag in candidate.finditer(html, start):
+        classes = _CLASS_ATTR.search(tag.group(0))
+        if classes and class_name in "".join(filter(None, classes.groups())).split():
+            return tag
+    raise SummaryNotFound(class_name)
+
+
+def _closes_before(html: str, start: int, end: int) -> int | None:
+    """Returns where the div opened just before start closes, if it does so before end."""
+    depth = 1
+    for tag in _DIV_TAG.finditer(html, start, end):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return tag.start()
+    return None
+
+
+def extract_summary_scan(html: str) -> list[str]:
+    """Targeted string scan over the rreport summary; no tree is built."""
+    if "<!--" in html:
+        html = _COMMENT.sub("", html)
+    report = _open_div(html, "rreport")
+    summary = _open_div(html, "summary", report.end())
+    if _closes_before(html, report.end(), summary.start()) is not None:
+        # The first summary after rreport is not inside it; let BeautifulSoup decide.
+        raise SummaryNotFound("summary")
+    end = _closes_before(html, summary.end(), len(html))
+    if end is None:
+        end = len(html)
+    cells = _TD.findall(html, summary.end(), end)
+    if len(cells) != len(_TD_OPEN.findall(html, summary.end(), end)):
+        # Unclosed or nested cells; only a real parser pairs them up.
+        raise SummaryNotFound("td")
+    return [unescape(_MARKUP.sub("", cell)) for cell in cells]
+
+
+def extract_summary_lxml(html: str) -> list[str]:
+    has_class = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+    summaries = lxml.html.fromstring(html).xpath(
+        f"(//div[{has_class.format('rreport')}])[1]"
+        f"/descendant::div[{has_class.format('summary')}][1]"
+    )
+    if not summaries:
+        raise SummaryNotFound("summary")
+    return [cell.text_content() for cell in summaries[0].iter("td")]
+
+
+def extract_summary_bs4(html: str) -> list[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    summary = (
+        soup.find("div", class_="rreport").find("div", class_="summary").find_all("td")
+    )
+    return [cell.text for cell in summary]
+
+
+BACKENDS = {"scan": extract_summary_scan, "bs4": extract_summary_bs4}
+if lxml is not None:
+    BACKENDS["lxml"] = extract_summary_lxml
+DEFAULT_BACKEND = "scan"
+
+
+def parse_insurance_data(html, backend: str = DEFAULT_BACKEND):
+    extract_summary = BACKENDS[backend]
+    try:
+        try:
+            summary = extract_summary(html)
+        except SummaryNotFound:
+            # Anything the fast paths cannot locate is left to BeautifulSoup.
+            summary = extract_summary_bs4(html)
+        if summary is None:
+            return "No data"
+
+        values = [text.strip() for text in summary if text]
+        combined = dict(zip(TITLES, values))
+
+        plate_changed, owner_changed = (
+            combined.pop("plate_and_owner").strip().replace("회", "").split("/")
+        )
+        combined.update(
+            {"plate_changed": int(plate_changed), "owner_changed": int(owner_changed)}
+        )
+        return combined
+    except Exception as exc:
+        if UNAVAILABLE in html:
+            return UNAVAILABLE
+        return exc.__class__
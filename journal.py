@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable
+from notion_writer import WriteOutcome
+
+logger = logging.getLogger(__name__)
+
+PLANNED = "planned"
+SENDING = "sending"
+DONE = "done"
+FAILED = "failed"
+
+
+def create_key(db_id: str, car_id: str) -> str:
+    return f"{db_id}/{car_id}"
+
+
+def update_key(page_id: str, properties: dict[str, Any]) -> str:
+    """Keyed by content as well, so a later, different update is not skipped."""
+    body = json.dumps(properties, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return f"{page_id}/{hashlib.blake2b(body, digest_size=8).hexdigest()}"
+
+
+class Journal:
+    """Write-ahead log of Notion writes, so an interrupted run can resume.
+
+    Each write is appended as planned when its batch is queued, as sending
+    right before its request goes out and as done or failed once it returns;
+    every append is fsynced. A write left planned never reached Notion and
+    is simply sent again, while a create left sending may have, so journaled
+    looks it up before retrying. Completed creates outlive their run until
+    the snapshot read by a later one includes them; other completed writes
+    are only skipped until finish() closes the run.
+    """
+
+    def __init__(self, file_name: str = "notion_journal.jsonl", fsync: bool = True) -> None:
+        self.file_name = file_name
+        self.fsync = fsync
+        self._opened = time.time()
+        self._entries: dict[tuple[str, str], dict[str, Any]] = {}
+        self._planned: set[tuple[str, str]] = set()
+        if os.path.exists(file_name):
+            self._load()
+        # Writes this process leaves unfinished are in doubt for the next one.
+        self._in_doubt = {
+            op_key: entry["state"]
+            for op_key, entry in self._entries.items()
+            if entry["state"] in (PLANNED, SENDING)
+        }
+        sending = list(self._in_doubt.values()).count(SENDING)
+        if self._in_doubt:
+            logger.warning(
+                f"{len(self._in_doubt)} journaled write(s) were interrupted, "
+                f"{sending} of them in flight",
+                extra={"stage": "journal"},
+            )
+        self._fp = open(file_name, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        valid = 0
+        with open(self.file_name, "rb") as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                self._entries[entry["op"], entry["key"]] = entry
+                valid += len(line)
+        # A crash can tear the last line; cut it off before appending again.
+        if valid < os.path.getsize(self.file_name):
+            with open(self.file_name, "r+b") as fp:
+                fp.truncate(valid)
+
+    def _append(self, entries: list[dict[str, Any]]) -> None:
+        self._fp.write(
+            "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        )
+        self._fp.flush()
+        if self.fsync:
+            os.fsync(self._fp.fileno())
+        for entry in entries:
+            self._entries[entry["op"], entry["key"]] = entry
+
+    def state(self, op: str, key: str) -> str | None:
+        entry = self._entries.get((op, key))
+        return entry["state"] if entry else None
+
+    def completed(self, op: str, key: str) -> bool:
+        return self.state(op, key) == DONE
+
+    def page_id(self, op: str, key: str) -> str | None:
+        """The page a completed write returned, e.g. the one a create made."""
+        entry = self._entries.get((op, key))
+        return entry.get("page_id") if entry else None
+
+    def in_doubt(self) -> list[dict[str, Any]]:
+        """Writes an earlier run left planned or sending."""
+        return [
+            {"op": op, "key": key, "state": state}
+            for (op, key), state in self._in_doubt.items()
+        ]
+
+    def was_sending(self, op: str, key: str) -> bool:
+        """Whether an earlier run sent this write without seeing the response."""
+        return self._in_doubt.get((op, key)) == SENDING
+
+    def plan(self, op: str, keys: Iterable[str]) -> None:
+        """Journals a batch of writes with a single fsync; done ones are left out."""
+        now = time.time()
+        entries = [
+            {"op": op, "key": key, "state": PLANNED, "time": now}
+            for key in keys
+            if (op, key) not in self._planned and not self.completed(op, key)
+        ]
+        if entries:
+            self._append(entries)
+            self._planned.update((op, entry["key"]) for entry in entries)
+
+    def sending(self, op: str, key: str) -> None:
+        if self.state(op, key) != SENDING:
+            entry = {"op": op, "key": key, "state": SENDING, "time": time.time()}
+            self._append([entry])
+        self._in_doubt.pop((op, key), None)
+
+    def done(self, op: str, key: str, page_id: str) -> None:
+        self._append(
+            [
+                {
+                    "op": op,
+                    "key": key,
+                    "state": DONE,
+                    "time": time.time(),
+                    "page_id": page_id,
+                }
+            ]
+        )
+        self._in_doubt.pop((op, key), None)
+
+    def record(self, op: str, key: str, outcome: WriteOutcome) -> None:
+        if outcome.ok:
+            self.done(op, key, (outcome.page or {}).get("id", outcome.target))
+            return
+        if outcome.status is None or outcome.status >= 500:
+            # Notion may have applied it anyway; left sending, the next run
+            # looks it up instead of sending it again.
+            return
+        entry = {
+            "op": op,
+            "key": key,
+            "state": FAILED,
+            "time": time.time(),
+            "error": f"{outcome.status} {outcome.error}",
+        }
+        self._append([entry])
+
+    def finish(self, snapshot_time: float | None = None) -> None:
+        """Closes a completed run, keeping only the creates a later one needs.
+
+        A create is dropped once a snapshot read after it would show the
+        page, i.e. when it completed before snapshot_time (by default the
+        time this journal was opened), and when its page was trashed. So the
+        journal holds at most the creates of one run, and a page deleted in
+        Notion is created again once its entry is gone.
+        """
+        if snapshot_time is None:
+            snapshot_time = self._opened
+        trashed = {
+            entry.get("page_id")
+            for (op, _), entry in self._entries.items()
+            if op == "trash" and entry["state"] == DONE
+        }
+        kept = [
+            entry
+            for (op, _), entry in self._entries.items()
+            if op == "create"
+            and entry["state"] == DONE
+            and entry["time"] >= snapshot_time
+            and entry.get("page_id") not in trashed
+        ]
+        self._fp.close()
+        temp_name = self.file_name + ".tmp"
+        with open(temp_name, "w", encoding="utf-8") as fp:
+            fp.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in kept))
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temp_name, self.file_name)
+        self._entries = {(entry["op"], entry["key"]): entry for entry in kept}
+        self._planned.clear()
+        self._in_doubt.clear()
+        self._opened = time.time()
+        self._fp = open(self.file_name, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        self._fp.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def journaled(
+    journal: Journal | None,
+    op: str,
+    key: str,
+    write: Callable[[Callable[[], None] | None], Awaitable[WriteOutcome]],
+    find: Callable[[], Awaitable[str | int | None]] | None = None,
+) -> str | int:
+    """Runs write unless the journal has it done; returns its result either way.
+
+    write gets a callback to call right before its request goes out, which
+    journals the write as sending. find looks up the page that a write an
+    earlier run left in flight may have made. When it returns one, the write
+    is recorded as done without being sent again; when the lookup fails with
+    a status, the write stays in doubt and the status is returned.
+    """
+    if journal is None:
+        return (await write(None)).result
+    if journal.completed(op, key):
+        return 200
+    if find is not None and journal.was_sending(op, key):
+        found = await find()
+        if isinstance(found, int):
+            return found
+        if found is not None:
+            journal.done(op, key, found)
+            return 200
+    journal.plan(op, [key])
+    outcome = await write(lambda: journal.sending(op, key))
+    journal.record(op, key, outcome)
+    return outcome.result
@@ -0,0 +1,177 @@
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator
+
+# Keys of a collected listing, in the order get_encar_vehicle_data used.
+LISTING_KEYS = (
+    "Badge",
+    "BadgeDetail",
+    "Transmission",
+    "FuelType",
+    "Year",
+    "FormYear",
+    "Mileage",
+    "Price",
+    "OfficeCityState",
+    "ModifiedDate",
+    "Availability",
+    "InsuranceInspection",
+    "Maker",
+    "Model",
+    "Submodel",
+)
+# Fields with few distinct values, shared between listings through sys.intern.
+CATEGORICAL_KEYS = (
+    "Badge",
+    "BadgeDetail",
+    "Transmission",
+    "FuelType",
+    "FormYear",
+    "OfficeCityState",
+    "Maker",
+    "Model",
+    "Submodel",
+)
+_SLOTS = (
+    "badge",
+    "badge_detail",
+    "transmission",
+    "fuel_type",
+    "year",
+    "form_year",
+    "mileage",
+    "price",
+    "location",
+    "modified_date",
+    "availability",
+    "insurance_inspection",
+    "maker",
+    "model",
+    "submodel",
+)
+_SLOT_OF = dict(zip(LISTING_KEYS, _SLOTS))
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Listing(Mapping):
+    """One collected Encar listing, read like the dict it replaces.
+
+    Values live in slots instead of a per-car dict and categorical strings
+    are interned, so cars of one sweep share their maker, model, badge and
+    location objects.
+    """
+
+    __slots__ = _SLOTS
+
+    def __init__(self, **values: Any) -> None:
+        for key, slot in _SLOT_OF.items():
+            value = values.get(key, "")
+            setattr(self, slot, _intern(value) if key in CATEGORICAL_KEYS else value)
+
+    @classmethod
+    def from_search_result(cls, car: dict[str, Any], target_vehicle: list) -> "Listing":
+        maker, model, submodel = target_vehicle
+        return cls(
+            **{key: car.get(key, "") for key in LISTING_KEYS[:10]},
+            Availability=1,
+            InsuranceInspection=-1,
+            Maker=maker,
+            Model=model,
+            Submodel=submodel,
+        )
+
+    def replace(self, **changes: Any) -> "Listing":
+        return Listing(**{**self, **changes})
+
+    def to_dict(self) -> dict[str, Any]:
+        """A plain, mutable and JSON-serialisable copy."""
+        return dict(self)
+
+    def __getitem__(self, key: str) -> Any:
+        slot = _SLOT_OF.get(key)
+        if slot is None:
+            raise KeyError(key)
+        return getattr(self, slot)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(LISTING_KEYS)
+
+    def __len__(self) -> int:
+        return len(LISTING_KEYS)
+
+    def __repr__(self) -> str:
+        return f"Listing({dict(self)!r})"
+
+
+_NUMERIC_COLUMNS = {
+    "Year": "i",
+    "FormYear": "i",
+    "Mileage": "i",
+    "Price": "i",
+    "Availability": "b",
+    "InsuranceInspection": "b",
+}
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ListingColumns:
+    """A whole sweep as one column per listing key.
+
+    Numeric keys are typed arrays (missing numbers are stored as 0) and the
+    others lists of shared strings, so a car costs a few machine words
+    instead of an object per field.
+    """
+
+    def __init__(self) -> None:
+        self.car_ids: list[str] = []
+        self._index: dict[str, int] = {}
+        self.columns: dict[str, array | list] = {
+            key: array(_NUMERIC_COLUMNS[key]) if key in _NUMERIC_COLUMNS else []
+            for key in LISTING_KEYS
+        }
+
+    @classmethod
+    def from_listings(
+        cls, cars: Mapping[str, Mapping[str, Any]]
+    ) -> "ListingColumns":
+        columns = cls()
+        columns.extend(cars.items())
+        return columns
+
+    def extend(self, cars: Iterable[tuple[str, Mapping[str, Any]]]) -> None:
+        columns = self.columns
+        for car_id, car in cars:
+            self._index[car_id] = len(self.car_ids)
+            self.car_ids.append(car_id)
+            for key in LISTING_KEYS:
+                value = car.get(key, "")
+                if key in _NUMERIC_COLUMNS:
+                    columns[key].append(_to_int(value))
+                elif key in CATEGORICAL_KEYS:
+                    columns[key].append(_intern(value))
+                else:
+                    columns[key].append(value)
+
+    def __len__(self) -> int:
+        return len(self.car_ids)
+
+    def __contains__(self, car_id: str) -> bool:
+        return car_id in self._index
+
+    def row(self, car_id: str) -> Listing:
+        i = self._index[car_id]
+        return Listing(**{key: column[i] for key, column in self.columns.items()})
+
+    def listings(self) -> dict[str, Listing]:
+        """The get_encar_vehicle_data view of the sweep."""
+        return {car_id: self.row(car_id) for car_id in self.car_ids}
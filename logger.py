@@ -1,5 +1,14 @@
+import copy
+import json
 import logging.config
-from typing import Optional
+import logging.handlers
+import os
+import queue
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, Optional
 
 
 class Logger:
@@ -41,3 +50,147 @@ LOGGING_CONFIG = {
         }
     },
 }
+
+
+CONTEXT_FIELDS = ("run_id", "stage", "car_id")
+_context: dict[str, ContextVar] = {
+    field: ContextVar(field, default=None) for field in CONTEXT_FIELDS
+}
+
+
+@contextmanager
+def log_context(**fields: str) -> Iterator[None]:
+    """Tags every record logged in the block, including from tasks it starts."""
+    tokens = [
+        (_context[name], _context[name].set(value)) for name, value in fields.items()
+    ]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the log_context fields onto records that do not set them via extra."""
+
+    def __init__(self, run_id: str | None = None) -> None:
+        super().__init__()
+        self.run_id = run_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _context.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+        if record.run_id is None:
+            record.run_id = self.run_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every sample_every records below min_level, per call site."""
+
+    def __init__(self, sample_every: int = 100, min_level: int = logging.INFO) -> None:
+        super().__init__()
+        self.sample_every = sample_every
+        self.min_level = min_level
+        self._seen: dict[tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.min_level or self.sample_every <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        seen = self._seen.get(site, 0)
+        self._seen[site] = seen + 1
+        return seen % self.sample_every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the log_context fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Keeps the traceback apart from the message for JsonFormatter."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class QueueLogging:
+    """Routes logging through a queue to a background JSON file writer.
+
+    Coroutines only enqueue records; formatting and file I/O happen on the
+    QueueListener thread. Context fields are captured when a record is
+    logged and debug records are sampled before they are queued.
+    """
+
+    def __init__(
+        self,
+        file_name: str = "logs/my_app.jsonl",
+        run_id: str | None = None,
+        level: int = logging.DEBUG,
+        sample_every: int = 100,
+        max_bytes: int = 10_000_000,
+        backup_count: int = 5,
+    ) -> None:
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.level = level
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.handler = _QueueHandler(self.queue)
+        self.handler.addFilter(SamplingFilter(sample_every))
+        self.handler.addFilter(ContextFilter(self.run_id))
+        if os.path.dirname(file_name):
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            file_name, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, file_handler)
+        self._previous_level = None
+
+    def start(self) -> "QueueLogging":
+        root = logging.getLogger()
+        self._previous_level = root.level
+        root.setLevel(self.level)
+        root.addHandler(self.handler)
+        self.listener.start()
+        return self
+
+    def stop(self) -> None:
+        """Flushes everything queued so far and detaches the handler."""
+        root = logging.getLogger()
+        root.removeHandler(self.handler)
+        if self._previous_level is not None:
+            root.setLevel(self._previous_level)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+    def __enter__(self) -> "QueueLogging":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
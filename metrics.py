@@ -0,0 +1,145 @@
+import json
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator
+
+PREFIX = "encar_"
+QUANTILES = (0.5, 0.9, 0.99)
+
+_NULL_TIMER = nullcontext()
+
+
+def _key(name: str, labels: dict[str, Any]) -> tuple:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _quantile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Counters and timers keyed by name and labels, for one run.
+
+    While disabled every call returns after one attribute check, so the
+    instrumented hot paths cost next to nothing unless a run enables it.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.counters: dict[tuple, float] = defaultdict(float)
+        self.timers: dict[tuple, array] = defaultdict(lambda: array("d"))
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.timers.clear()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        self.counters[_key(name, labels)] += value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        self.timers[_key(name, labels)].append(seconds)
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict[str, Any]) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[_key(name, labels)].append(time.perf_counter() - started)
+
+    def time(self, name: str, **labels: Any):
+        """Context manager observing the duration of its block in seconds."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name, labels)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return self.counters.get(_key(name, labels), 0.0)
+
+    def hit_rate(self, name: str, **labels: Any) -> float | None:
+        """hit / (hit + miss) of a counter labelled result=hit|miss."""
+        hits = self.counter(name, result="hit", **labels)
+        misses = self.counter(name, result="miss", **labels)
+        return hits / (hits + misses) if hits + misses else None
+
+    def summary(self) -> dict[str, list[dict[str, Any]]]:
+        """JSON-ready counters and timer quantiles."""
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(self.counters.items())
+        ]
+        timers = []
+        for (name, labels), samples in sorted(self.timers.items()):
+            ordered = sorted(samples)
+            timers.append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": len(ordered),
+                    "sum": sum(ordered),
+                    **{f"p{int(q * 100)}": _quantile(ordered, q) for q in QUANTILES},
+                }
+            )
+        return {"counters": counters, "timers": timers}
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False, indent=4)
+
+    def to_prometheus(self) -> str:
+        """The Prometheus text exposition format; timers become summaries."""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            value = int(value) if value.is_integer() else value
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for (name, labels), samples in sorted(self.timers.items()):
+            metric = f"{PREFIX}{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            ordered = sorted(samples)
+            for q in QUANTILES:
+                quantile = _labels(labels, f'quantile="{q}"')
+                lines.append(f"{metric}{quantile} {_quantile(ordered, q):.6f}")
+            lines.append(f"{metric}_sum{_labels(labels)} {sum(ordered):.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {len(ordered)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_name: str) -> None:
+        """Prometheus text for a .prom file name, JSON otherwise."""
+        text = self.to_prometheus() if file_name.endswith(".prom") else self.to_json()
+        with open(file_name, "w", encoding="utf-8") as fp:
+            fp.write(text)
+
+
+# Shared by every instrumented module; a run calls metrics.enable() to record.
+metrics = Metrics()
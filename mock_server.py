@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import random
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
+from aiohttp import web
+import encar_insurance
+import encar_search
+import notion_api
+import notion_writer
+from listing import Listing
+from notion_schema import DECODERS, SCHEMA, encode_page_properties
+
+_INSURANCE_PAGE = """<html><head><title>보험이력</title></head><body>
+<div class="rreport type1">
+  <div class="summary">
+    <table>
+      <tr><th>일반</th><td> {general}회 </td><th>영업용</th><td>없음</td></tr>
+      <tr><th>번호/소유자</th><td>{plates}회/ {owners}회</td><th>전손</th><td>{total_loss}</td></tr>
+      <tr><th>내차피해</th><td><span>{own}회</span> (0원)</td><th>타차가해</th><td>{other}회</td></tr>
+    </table>
+  </div>
+</div></body></html>"""
+_UNAVAILABLE_PAGE = "<html><body><p>조회불가차량</p></body></html>"
+# The [maker, model, submodel] every served car belongs to.
+DEFAULT_VEHICLE = ["현대", "그랜저", "그랜저 IG"]
+# Query conditions the mock applies; any other condition matches every page.
+_EQUALS_TYPES = ("title", "rich_text", "select")
+
+
+def make_dataset(size: int, seed: int = 0) -> list[dict[str, Any]]:
+    """Search results as Encar returns them, newest ModifiedDate first."""
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    cars = []
+    for i in range(size):
+        modified = now - timedelta(minutes=rng.randrange(60 * 24 * 60))
+        cars.append(
+            {
+                "Id": str(30_000_000 + i),
+                "Badge": rng.choice(["2.4", "3.0", "3.3"]),
+                "BadgeDetail": rng.choice(["익스클루시브", "프리미엄", "셀러브리티"]),
+                "Transmission": "오토",
+                "FuelType": rng.choice(["가솔린", "디젤", "가솔린+전기"]),
+                "Year": 201601 + rng.randrange(6) * 100,
+                "FormYear": str(2016 + rng.randrange(6)),
+                "Mileage": rng.randrange(200_000),
+                "Price": rng.randrange(1_000, 5_000),
+                "OfficeCityState": rng.choice(["서울", "경기", "부산", "인천"]),
+                "ModifiedDate": modified.strftime("%Y-%m-%d %H:%M:%S.000 +09"),
+            }
+        )
+    cars.sort(key=lambda car: car["ModifiedDate"], reverse=True)
+    return cars
+
+
+class MockServer:
+    """Local stand-in for the Encar search, insurance and Notion endpoints.
+
+    Every car belongs to vehicle. Notion starts with notion_fraction of the
+    listed cars plus some that are no longer listed. Every request waits
+    latency seconds, and requests under rate_limited_paths (Notion page
+    writes by default) fail with 429 and a Retry-After of retry_after
+    seconds at rate_limit_ratio. counts holds the requests served per
+    endpoint.
+    """
+
+    def __init__(
+        self,
+        size: int = 1_000,
+        latency: float = 0.0,
+        rate_limit_ratio: float = 0.0,
+        retry_after: float = 0.05,
+        notion_fraction: float = 0.8,
+        seed: int = 0,
+        rate_limited_paths: tuple[str, ...] = ("/v1/pages",),
+        vehicle: list[str] = DEFAULT_VEHICLE,
+    ) -> None:
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.rate_limited_paths = rate_limited_paths
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        # A tenth more cars than are listed, so the Notion side has sold ones.
+        cars = make_dataset(size + size // 10, seed)
+        sold = {car["Id"] for car in self.rng.sample(cars, size // 10)}
+        self.cars = [car for car in cars if car["Id"] not in sold]
+        self.by_price = sorted(self.cars, key=lambda car: car["Price"], reverse=True)
+        self.counts: Counter = Counter()
+        self.pages: dict[str, dict[str, Any]] = {}
+        self.database_id = str(uuid.UUID(int=seed))
+        tracked = self.cars[: int(size * notion_fraction)]
+        for i, car in enumerate(tracked + [car for car in cars if car["Id"] in sold]):
+            # Every fifth tracked car was recorded at an older price.
+            recorded = Listing.from_search_result(car, vehicle).to_dict()
+            if i % 5 == 0:
+                recorded["Price"] += 100
+            self._store_page(encode_page_properties(car["Id"], recorded))
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.add_routes(
+            [
+                web.get("/search/car/list/premium", self.search),
+                web.get("/dc/dc_cardetailview.do", self.insurance),
+                web.get("/v1/databases/{db_id}", self.database),
+                web.post("/v1/databases/{db_id}/query", self.query),
+                web.post("/v1/pages", self.create_page),
+                web.patch("/v1/pages/{page_id}", self.update_page),
+            ]
+        )
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        self.counts[request.match_info.route.resource.canonical] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if (
+            request.path.startswith(self.rate_limited_paths)
+            and self.rng.random() < self.rate_limit_ratio
+        ):
+            self.counts["429"] += 1
+            return web.json_response(
+                {"object": "error", "code": "rate_limited"},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        return await handler(request)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def requests(self) -> int:
+        return sum(count for key, count in self.counts.items() if key != "429")
+
+    async def search(self, request: web.Request) -> web.Response:
+        _, sort, start, size = request.query.get("sr", "|PriceDesc|0|100").split("|")
+        cars = self.cars if sort == "ModifiedDate" else self.by_price
+        start, size = int(start), int(size)
+        return web.json_response(
+            {"Count": len(cars), "SearchResults": cars[start : start + size]}
+        )
+
+    async def insurance(self, request: web.Request) -> web.Response:
+        car_id = request.query.get("carid", "")
+        rng = random.Random(car_id)
+        if rng.random() < 0.1:
+            return web.Response(text=_UNAVAILABLE_PAGE, content_type="text/html")
+        html = _INSURANCE_PAGE.format(
+            general=rng.randrange(3),
+            plates=rng.randrange(3),
+            owners=rng.randrange(1, 4),
+            total_loss=rng.choice(["없음", "없음", "1회"]),
+            own=rng.randrange(3),
+            other=rng.randrange(3),
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def database(self, request: web.Request) -> web.Response:
+        properties = {
+            field.property: {"id": f"p{i}", "type": field.type}
+            for i, field in enumerate(SCHEMA)
+        }
+        return web.json_response({"id": request.match_info["db_id"], "properties": properties})
+
+    def _store_page(self, properties: dict[str, Any]) -> dict:
+        page_id = str(uuid.uuid4())
+        page = {
+            "object": "page",
+            "id": page_id,
+            "last_edited_time": datetime.now(tz=timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S.000Z"
+            ),
+            "in_trash": False,
+            "properties": properties,
+        }
+        self.pages[page_id] = page
+        return page
+
+    def _matches(self, page: dict[str, Any], payload: dict[str, Any]) -> bool:
+        """Only equals conditions on text and select properties are applied."""
+        for condition in (payload.get("filter") or {}).get("and", []):
+            for kind in _EQUALS_TYPES:
+                if "equals" in condition.get(kind, {}):
+                    value = page["properties"].get(condition["property"], {})
+                    if DECODERS[kind](value) != condition[kind]["equals"]:
+                        return False
+        return True
+
+    async def query(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        page_ids = [
+            id
+            for id, page in self.pages.items()
+            if not page["in_trash"] and self._matches(page, payload)
+        ]
+        start = int(payload.get("start_cursor") or 0)
+        end = start + int(payload.get("page_size", 100))
+        return web.json_response(
+            {
+                "results": [self.pages[id] for id in page_ids[start:end]],
+                "has_more": end < len(page_ids),
+                "next_cursor": str(end) if end < len(page_ids) else None,
+            }
+        )
+
+    async def create_page(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        return web.json_response(self._store_page(payload.get("properties", {})))
+
+    async def update_page(self, request: web.Request) -> web.Response:
+        page = self.pages.get(request.match_info["page_id"])
+        if page is None:
+            return web.json_response({"object": "error"}, status=404)
+        payload = await request.json()
+        page["properties"].update(payload.get("properties", {}))
+        page["in_trash"] = payload.get("in_trash", page["in_trash"])
+        return web.json_response(page)
+
+
+@contextmanager
+def redirect(base_url: str) -> Iterator[None]:
+    """Point the Encar and Notion helpers at a MockServer for the block."""
+    targets = [
+        (encar_search, "SEARCH_URL", "/search/car/list/premium?count=true&q="),
+        (
+            encar_insurance,
+            "INSURANCE_URL",
+            "/dc/dc_cardetailview.do?method=kidiFirstPop&carid=",
+        ),
+        (notion_writer, "NOTION_API_URL", "/v1"),
+        (notion_api, "NOTION_API_URL", "/v1"),
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in targets]
+    for module, name, path in targets:
+        setattr(module, name, base_url + path)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = MockServer(args.size, args.latency, args.rate_limit_ratio)
+    base_url = await server.start(port=args.port)
+    print(f"Serving {args.size} cars at {base_url} (Notion database {server.database_id})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Encar/Notion stand-in.")
+    parser.add_argument("--size", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8080)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 import asyncio
 import json
-from typing import Any
+from typing import Any, AsyncIterator, Iterable, Mapping
 import aiohttp
-from payload_generator import PayloadGenerator, VARIABLE_PROPERTY_NAMES, VARIABLE_TYPES
+from notion_writer import (
+    NOTION_API_URL,
+    NotionWriteEngine,
+    notion_header,
+    write_engine,
+)
+from notion_schema import (
+    FIELDS,
+    RECORD_PROPERTIES,
+    check_database,
+    database_properties,
+    decode_page,
+    encode_page_properties,
+)
+from journal import Journal, create_key, journaled, update_key
+from metrics import metrics
+from notion_query import NotionFilter
+from payload_generator import PAYLOAD_GENERATOR
 
 
 def generate_payload_create_db(parent_page_id: str, db_title: str) -> dict[str, Any]:
@@ -11,111 +28,19 @@ def generate_payload_create_db(parent_page_id: str, db_title: str) -> dict[str,
         "icon": {"type": "emoji", "emoji": "🚗"},
         "cover": None,
         "title": [{"type": "text", "text": {"content": db_title, "link": None}}],
-        "properties": {
-            "Car ID": {"title": {}},
-            "Maker": {
-                "select": {
-                    "options": [
-                        {"name": "현대", "color": "blue"},
-                        {"name": "기아", "color": "red"},
-                    ]
-                }
-            },
-            "Model": {"rich_text": {}},
-            "Submodel": {"rich_text": {}},
-            "Badge": {"rich_text": {}},
-            "Badge Detail": {"rich_text": {}},
-            "Transmission": {"rich_text": {}},
-            "Fuel Type": {
-                "select": {
-                    "options": [
-                        {"name": "⛽Gasoline", "color": "red"},
-                        {"name": "🛢️Diesel", "color": "gray"},
-                        {"name": "⚡Electric", "color": "green"},
-                        {"name": "⚡Hybrid⛽", "color": "blue"},
-                    ]
-                }
-            },
-            "Year": {"number": {}},
-            "Form Year": {"number": {}},
-            "Mileage": {"number": {}},
-            "Price": {"number": {"format": "won"}},
-            "Location": {"rich_text": {}},
-            "Modified Date": {"date": {}},
-            "URL": {"url": {}},
-            "Insurance & Inspection Check": {
-                "select": {
-                    "options": [
-                        {"name": "✅True", "color": "green"},
-                        {"name": "🚫False", "color": "red"},
-                        {"name": "🚧Pending", "color": "yellow"},
-                    ]
-                }
-            },
-            "Availability": {
-                "select": {
-                    "options": [
-                        {"name": "✅True", "color": "green"},
-                        {"name": "🚫False", "color": "red"},
-                    ]
-                }
-            },
-        },
+        "properties": database_properties(),
     }
     return data
 
 
 def generate_payload_create_page(
-    parent_db_id: str, car_id: str, car_data: dict[str, Any]
+    parent_db_id: str, car_id: str, car_data: Mapping[str, Any]
 ) -> dict[str, Any]:
-    fuel_converter = {
-        "가솔린": "⛽Gasoline",
-        "디젤": "🛢️Diesel",
-        "전기": "⚡Electric",
-        "가솔린+전기": "⚡Hybrid⛽",
-    }
-    int_converter = {
-        1: "✅True",
-        0: "🚫False",
-        -1: "🚧Pending",
-    }
-    format_time = lambda time: "T".join(time.split(" ")[:1])
-    format_txt = lambda data: {"rich_text": [{"text": {"content": data}}]}
     data = {
         "parent": {"database_id": parent_db_id},
         "icon": None,
         "cover": None,
-        "properties": {
-            "Car ID": {"title": [{"text": {"content": car_id}}]},
-            "Maker": {"select": {"name": car_data.get("Maker", "")}},
-            "Model": format_txt(car_data.get("Model", "")),
-            "Submodel": format_txt(car_data.get("Submodel", "")),
-            "Badge": format_txt(car_data.get("Badge", "")),
-            "Badge Detail": format_txt(car_data.get("BadgeDetail", "")),
-            "Transmission": format_txt(car_data.get("Transmission", "")),
-            "Fuel Type": {
-                "select": {"name": fuel_converter.get(car_data.get("FuelType", 0))}
-            },
-            "Availability": {
-                "select": {"name": int_converter.get(car_data.get("Availability", 0))}
-            },
-            "Insurance & Inspection Check": {
-                "select": {
-                    "name": int_converter.get(car_data.get("InsuranceInspection", 0))
-                }
-            },
-            "Year": {"number": car_data.get("Year", 0)},
-            "Form Year": {"number": int(car_data.get("FormYear", 0))},
-            "Mileage": {"number": car_data.get("Mileage", 0)},
-            "Price": {"number": car_data.get("Price", 0) * 10000},
-            "Location": format_txt(car_data.get("OfficeCityState", "")),
-            "Modified Date": {
-                "date": {"start": format_time(car_data.get("ModifiedDate", ""))}
-            },
-            "URL": {
-                "url": f"http://www.encar.com/dc/dc_cardetailview.do?pageid=dc_carsearch&listAdvType=pic&carid={car_id}"
-            },
-        },
+        "properties": encode_page_properties(car_id, car_data),
     }
     return data
 
@@ -123,35 +48,35 @@ def generate_payload_create_page(
 async def _create_notion_db(
     session, api_key: str, parent_page_id: str, db_name: str
 ) -> dict[str, Any]:
-    url = "https://api.notion.com/v1/databases"
-    header = {
-        "authorization": api_key,
-        "accept": "application/json",
-        "Notion-Version": "2022-06-28",
-    }
+    url = f"{NOTION_API_URL}/databases"
+    header = notion_header(api_key)
     payload = generate_payload_create_db(parent_page_id, db_name)
 
     async with session.post(url, headers=header, json=payload) as r:
         if r.status != 200:
             return r.status
         text = await r.text()
-        return json.loads(text).get("id")
+    database = json.loads(text)
+    check_database(database)
+    return database.get("id")
 
 
 async def _create_notion_page(
-    session, api_key: str, db_id: str, car_id: str, car_data: list
+    engine: NotionWriteEngine,
+    db_id: str,
+    car_id: str,
+    car_data: list,
+    journal: Journal | None = None,
 ) -> str | int:
-    url = "https://api.notion.com/v1/pages"
-    header = {
-        "authorization": api_key,
-        "accept": "application/json",
-        "Notion-Version": "2022-06-28",
-    }
-    payload = generate_payload_create_page(db_id, car_id, car_data)
-    async with session.post(url, headers=header, json=payload) as r:
-        if r.status == 200:
-            return r.status
-        return await r.text()
+    return await journaled(
+        journal,
+        "create",
+        create_key(db_id, car_id),
+        lambda on_send: engine.create_page(
+            generate_payload_create_page(db_id, car_id, car_data), car_id, on_send
+        ),
+        lambda: find_page_id(engine.session, engine.api_key, db_id, car_id),
+    )
 
 
 async def create_db_and_pages(
@@ -164,132 +89,167 @@ async def create_db_and_pages(
             parent_page_id=parent_page_id,
             db_name=db_name,
         )
-        tasks = [
-            _create_notion_page(
-                session,
-                api_key=api_key,
-                db_id=db_id,
-                car_id=id,
-                car_data=car_data.get(id),
-            )
-            for id in car_data
-        ]
-        result = await asyncio.gather(*tasks)
-        return result
+        async with NotionWriteEngine(api_key, session=session) as engine:
+            tasks = [
+                _create_notion_page(
+                    engine,
+                    db_id=db_id,
+                    car_id=id,
+                    car_data=car_data.get(id),
+                )
+                for id in car_data
+            ]
+            result = await asyncio.gather(*tasks)
+            return result
+
+
+class NotionQueryError(Exception):
+    def __init__(self, status: int, message: str = "") -> None:
+        super().__init__(f"Notion query failed with {status}: {message}")
+        self.status = status
+
+
+def _filter_payload(filters: list | NotionFilter = None) -> dict[str, Any]:
+    if isinstance(filters, NotionFilter):
+        return filters.payload()
+    return NotionFilter.from_vehicle(filters).payload()
+
+
+async def _iter_notion_db(
+    session,
+    api_key: str,
+    db_id: str,
+    payload: dict[str, Any],
+    property_ids: list[str] | None = None,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """Yields the raw results of each query response, 100 pages at a time."""
+    url = f"{NOTION_API_URL}/databases/{db_id}/query"
+    header = notion_header(api_key)
+    params = [("filter_properties", id) for id in property_ids or []]
+    payload = {**payload, "page_size": 100}
+    while True:
+        with metrics.time("request_seconds", endpoint="notion_query"):
+            async with session.post(
+                url, headers=header, json=payload, params=params
+            ) as r:
+                metrics.inc("requests", endpoint="notion_query", status=r.status)
+                body = await r.read()
+                metrics.inc("response_bytes", len(body), endpoint="notion_query")
+                if r.status != 200:
+                    raise NotionQueryError(r.status, await r.text())
+                json_data = await r.json()
+        metrics.inc("records", len(json_data.get("results") or ()), stage="notion_read")
+        yield json_data.get("results")
+        if not json_data.get("has_more"):
+            break
+        payload["start_cursor"] = json_data.get("next_cursor")
 
 
 async def _query_notion_db(
-    session, api_key: str, db_id: str, filters: list = None
+    session, api_key: str, db_id: str, filters: list | NotionFilter = None
 ) -> list[dict[str, Any]]:
-    url = f"https://api.notion.com/v1/databases/{db_id}/query"
-    header = {
-        "authorization": api_key,
-        "accept": "application/json",
-        "Notion-Version": "2022-06-28",
-    }
     memo = []
-    payload = {}
-    if filters:
-        maker, model, submodel = filters
-        payload = {
-            "filter": {
-                "and": [
-                    {"property": "Maker", "select": {"equals": maker}},
-                    {"property": "Model", "rich_text": {"equals": model}},
-                    {"property": "Submodel", "rich_text": {"equals": submodel}},
-                ]
-            }
-        }
-
-    async def __get_paginated_requests(start_cursor: str = None):
-        while True:
-            if start_cursor:
-                payload["start_cursor"] = start_cursor
-            async with session.post(url, headers=header, json=payload) as r:
-                if r.status != 200:
-                    return r.status, memo
-                json_data = await r.json()
-                has_more = json_data.get("has_more")
-                results = json_data.get("results")
-                next_cursor = json_data.get("next_cursor")
-                memo.extend(results)
-                if not has_more:
-                    break
-                start_cursor = next_cursor
-        return 200, memo
-
-    status, memo = await __get_paginated_requests()
-
-    if status != 200:
-        return status
+    try:
+        async for results in _iter_notion_db(
+            session, api_key, db_id, _filter_payload(filters)
+        ):
+            memo.extend(results)
+    except NotionQueryError as exc:
+        return exc.status
     return memo
 
 
+async def find_page_id(
+    session, api_key: str, db_id: str, car_id: str
+) -> str | int | None:
+    """The ID of the page whose Car ID title is car_id, or the error status."""
+    payload = NotionFilter().car_id(car_id).payload()
+    try:
+        async for results in _iter_notion_db(session, api_key, db_id, payload):
+            for page in results:
+                return page.get("id")
+    except NotionQueryError as exc:
+        return exc.status
+    return None
+
+
+async def _get_property_ids(
+    session, api_key: str, db_id: str, property_names: Iterable[str]
+) -> list[str] | None:
+    """Resolves property names to the IDs filter_properties expects.
+
+    Raises SchemaError when the database no longer matches the schema, so a
+    renamed property fails the read up front instead of every later write.
+    """
+    url = f"{NOTION_API_URL}/databases/{db_id}"
+    async with session.get(url, headers=notion_header(api_key)) as r:
+        if r.status != 200:
+            return None
+        database = await r.json()
+    check_database(database)
+    properties = database.get("properties", {})
+    ids = [properties[name]["id"] for name in property_names if name in properties]
+    return ids or None
+
+
+async def iter_notion_records(
+    session, api_key: str, db_id: str, filters: list | NotionFilter = None
+) -> AsyncIterator[dict[str, dict[str, Any]]]:
+    """Yields extract_specific_data records one query response at a time.
+
+    Only the properties the records are decoded from are requested, and no
+    raw response outlives the batch it was decoded into.
+    """
+    property_ids = await _get_property_ids(session, api_key, db_id, RECORD_PROPERTIES)
+    async for results in _iter_notion_db(
+        session, api_key, db_id, _filter_payload(filters), property_ids
+    ):
+        yield extract_specific_data(results)
+
+
+async def iter_notion_page_ids(
+    session, api_key: str, db_id: str, filters: list | NotionFilter = None
+) -> AsyncIterator[list[str]]:
+    """Yields the IDs of the live pages, 100 at a time.
+
+    Only the Car ID property is requested, which keeps this listing cheap
+    enough to run far more often than a full read. The query endpoint never
+    returns trashed pages, so comparing these IDs against a snapshot is how
+    deletions are found.
+    """
+    property_ids = await _get_property_ids(
+        session, api_key, db_id, [FIELDS["car_id"].property]
+    )
+    async for results in _iter_notion_db(
+        session, api_key, db_id, _filter_payload(filters), property_ids
+    ):
+        yield [page.get("id") for page in results]
+
+
 async def _update_notion_page(
-    session, api_key: str, page_id: str, update_data: dict[str, Any]
+    engine: NotionWriteEngine,
+    page_id: str,
+    update_data: dict[str, Any],
+    journal: Journal | None = None,
 ) -> str | int:
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-    header = {
-        "authorization": api_key,
-        "accept": "application/json",
-        "Notion-Version": "2022-06-28",
-    }
     if update_data:
-        payload = {"properties": update_data}
-        async with session.patch(url, headers=header, json=payload) as r:
-            if r.status == 200:
-                return r.status
-            return await r.text()
+        return await journaled(
+            journal,
+            "update",
+            update_key(page_id, update_data),
+            lambda on_send: engine.update_page(page_id, update_data),
+        )
     return "Data for update is not provided."
 
 
-async def _trash_notion_page(session, api_key: str, page_id: str) -> str | int:
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-    header = {
-        "authorization": api_key,
-        "accept": "application/json",
-        "Notion-Version": "2022-06-28",
-    }
-    payload = {"in_trash": True}
-    async with session.patch(url, headers=header, json=payload) as r:
-        if r.status == 200:
-            return r.status
-        return await r.text()
+async def _trash_notion_page(engine: NotionWriteEngine, page_id: str) -> str | int:
+    outcome = await engine.trash_page(page_id)
+    return outcome.result
 
 
 def extract_specific_data(notion_db: list[dict[str, Any]]) -> dict[str, dict]:
     """Return a dict of car IDs as keys, availability and last_edited_time as values."""
-    converter = {
-        "✅True": True,
-        "🚫False": False,
-    }
-    return {
-        car.get("properties")
-        .get("Car ID")
-        .get("title")[0]
-        .get("plain_text"): {
-            "availability": converter.get(
-                car.get("properties", {})
-                .get("Availability", {})
-                .get("select", {})
-                .get("name")
-            ),
-            "page_id": car.get("id"),
-            "last_edited_time": car.get("last_edited_time"),
-            "price": car.get("properties", {}).get("Price", {}).get("number"),
-            "comment": (
-                car.get("properties", {})
-                .get("Comment", {})
-                .get("rich_text", [])[0]
-                .get("text", {})
-                .get("content")
-                if car.get("properties", {}).get("Comment", {}).get("rich_text", [])
-                else None
-            ),
-        }
-        for car in notion_db
-        if car.get("properties", {}).get("Car ID", {}).get("title")
-    }
+    return dict(filter(None, map(decode_page, notion_db)))
 
 
 def get_page_ids_from_formatted_db(targets: list[str], formatted_db: dict[str, dict[str, bool | str]]) -> list[str]:
@@ -299,9 +259,12 @@ def get_page_ids_from_formatted_db(targets: list[str], formatted_db: dict[str, d
 def get_page_ids_from_car_ids(
     notion_db: list[dict[str, Any]], car_ids: list[str]
 ) -> list[str]:
+    car_ids = set(car_ids)
     page_ids = []
     for car in notion_db:
-        car_id_title = car.get("properties", {}).get("Car ID", {}).get("title", [])
+        car_id_title = (
+            car.get("properties", {}).get(FIELDS["car_id"].property, {}).get("title", [])
+        )
         if not car_id_title:
             continue
         car_id = car_id_title[0].get("plain_text")
@@ -322,16 +285,24 @@ async def call_create_notion_db(api_key: str, parent_page_id: str, db_name: str)
 
 
 async def create_notion_pages(
-    api_key: str, db_id: str, car_data: dict[str, dict[str, any]]
+    api_key: str,
+    db_id: str,
+    car_data: dict[str, dict[str, any]],
+    store=None,
+    engine: NotionWriteEngine | None = None,
+    journal: Journal | None = None,
 ) -> list[str]:
-    async with aiohttp.ClientSession() as session:
+    """With a journal, cars it has already created are skipped, not re-sent."""
+    if journal is not None:
+        journal.plan("create", [create_key(db_id, id) for id in car_data])
+    async with write_engine(api_key, store, engine) as engine:
         tasks = [
             _create_notion_page(
-                session,
-                api_key=api_key,
+                engine,
                 db_id=db_id,
                 car_id=id,
                 car_data=car_data.get(id),
+                journal=journal,
             )
             for id in car_data
         ]
@@ -340,34 +311,50 @@ async def create_notion_pages(
 
 
 async def update_pages_with_page_ids(
-    api_key: str, page_ids: list, update_data: dict[str, Any]
+    api_key: str,
+    page_ids: list,
+    update_data: dict[str, Any],
+    store=None,
+    engine: NotionWriteEngine | None = None,
 ) -> list[str]:
-    pg = PayloadGenerator(VARIABLE_PROPERTY_NAMES, VARIABLE_TYPES)
-    update_data_payload = pg.generate(update_data)
-    async with aiohttp.ClientSession() as session:
-        tasks = [
-            _update_notion_page(session, api_key, id, update_data_payload) for id in page_ids
-        ]
+    update_data_payload = PAYLOAD_GENERATOR.generate(update_data)
+    async with write_engine(api_key, store, engine) as engine:
+        tasks = [_update_notion_page(engine, id, update_data_payload) for id in page_ids]
         results = await asyncio.gather(*tasks)
         return results
 
 
 async def update_pages_with_update_targets(
-    api_key: str, update_targets: dict[str, dict[str, Any]]
+    api_key: str,
+    update_targets: dict[str, dict[str, Any]],
+    store=None,
+    engine: NotionWriteEngine | None = None,
+    journal: Journal | None = None,
 ) -> list[str]:
-    pg = PayloadGenerator(VARIABLE_PROPERTY_NAMES, VARIABLE_TYPES)
-    async with aiohttp.ClientSession() as session:
+    """With a journal, updates it has already applied this run are skipped."""
+    payloads = {
+        page_id: PAYLOAD_GENERATOR.generate(update_data)
+        for page_id, update_data in update_targets.items()
+    }
+    if journal is not None:
+        journal.plan(
+            "update",
+            [update_key(page_id, payload) for page_id, payload in payloads.items() if payload],
+        )
+    async with write_engine(api_key, store, engine) as engine:
         tasks = [
-            _update_notion_page(session, api_key, page_id, pg.generate(update_data))
-            for page_id, update_data in update_targets.items()
+            _update_notion_page(engine, page_id, payload, journal)
+            for page_id, payload in payloads.items()
         ]
         results = await asyncio.gather(*tasks)
         return results
 
 
-async def trash_pages_with_page_ids(api_key: str, page_ids: list) -> list[str]:
-    async with aiohttp.ClientSession() as session:
-        tasks = [_trash_notion_page(session, api_key, id) for id in page_ids]
+async def trash_pages_with_page_ids(
+    api_key: str, page_ids: list, store=None, engine: NotionWriteEngine | None = None
+) -> list[str]:
+    async with write_engine(api_key, store, engine) as engine:
+        tasks = [_trash_notion_page(engine, id) for id in page_ids]
         results = await asyncio.gather(*tasks)
         return results
 
@@ -380,3 +367,17 @@ async def get_notion_db(
             session=session, api_key=api_key, db_id=db_id, filters=filters
         )
         return db
+
+
+async def get_notion_records(
+    api_key: str, db_id: str, filters: list | NotionFilter = None
+) -> dict[str, dict[str, Any]] | int:
+    """Streamed equivalent of extract_specific_data(get_notion_db(...))."""
+    records = {}
+    async with aiohttp.ClientSession() as session:
+        try:
+            async for batch in iter_notion_records(session, api_key, db_id, filters):
+                records.update(batch)
+        except NotionQueryError as exc:
+            return exc.status
+    return records
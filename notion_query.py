@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Any
+from notion_schema import AVAILABILITY_STATUSES, FIELDS
+
+
+class NotionFilter:
+    """Builds the filter of a Notion database query from schema fields.
+
+    Every added condition must hold; the result of payload() is sent as the
+    query body so Notion does the filtering server-side.
+    """
+
+    def __init__(self) -> None:
+        self.conditions: list[dict[str, Any]] = []
+
+    @classmethod
+    def from_vehicle(cls, filters: list | None) -> "NotionFilter":
+        """From the [maker, model, submodel] list the Notion helpers take."""
+        query = cls()
+        if filters:
+            query.vehicle(*filters)
+        return query
+
+    def _add(self, variable: str, condition: dict[str, Any]) -> "NotionFilter":
+        field = FIELDS[variable]
+        self.conditions.append({"property": field.property, field.type: condition})
+        return self
+
+    def _range(self, variable: str, low: Any, high: Any) -> "NotionFilter":
+        if low is not None:
+            self._add(variable, {"greater_than_or_equal_to": low})
+        if high is not None:
+            self._add(variable, {"less_than_or_equal_to": high})
+        return self
+
+    def vehicle(self, maker: str, model: str, submodel: str) -> "NotionFilter":
+        self._add("maker", {"equals": maker})
+        self._add("model", {"equals": model})
+        return self._add("submodel", {"equals": submodel})
+
+    def car_id(self, car_id: str) -> "NotionFilter":
+        return self._add("car_id", {"equals": car_id})
+
+    def availability(self, available: bool) -> "NotionFilter":
+        status = AVAILABILITY_STATUSES[int(available)]
+        return self._add("availability", {"equals": status})
+
+    def price_range(
+        self, low: int | None = None, high: int | None = None
+    ) -> "NotionFilter":
+        """Bounds in won, as the Price property stores them."""
+        return self._range("price", low, high)
+
+    def year_range(
+        self, start: int | None = None, end: int | None = None
+    ) -> "NotionFilter":
+        """Bounds in Encar's YYYYMM Year format."""
+        return self._range("year", start, end)
+
+    def edited_on_or_after(self, timestamp: datetime | str) -> "NotionFilter":
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.isoformat()
+        self.conditions.append(
+            {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": timestamp},
+            }
+        )
+        return self
+
+    def payload(self) -> dict[str, Any]:
+        if not self.conditions:
+            return {}
+        return {"filter": {"and": list(self.conditions)}}
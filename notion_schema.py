@@ -0,0 +1,301 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Mapping
+
+FUEL_TYPES = {
+    "가솔린": "⛽Gasoline",
+    "디젤": "🛢️Diesel",
+    "전기": "⚡Electric",
+    "가솔린+전기": "⚡Hybrid⛽",
+}
+STATUSES = {
+    1: "✅True",
+    0: "🚫False",
+    -1: "🚧Pending",
+}
+AVAILABILITY_STATUSES = {
+    1: "✅True",
+    0: "🚫False",
+}
+AVAILABILITY = {name: bool(status) for status, name in AVAILABILITY_STATUSES.items()}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _format_date(value: datetime | str) -> dict:
+    return {"date": {"start": value if isinstance(value, str) else value.isoformat()}}
+
+
+ENCODERS: dict[str, Callable[[Any], dict]] = {
+    "title": lambda x: {"title": [{"text": {"content": x}}]},
+    "rich_text": lambda x: {"rich_text": [{"text": {"content": x}}]},
+    "number": lambda x: {"number": x},
+    "select": lambda x: {"select": {"name": x}},
+    "date": _format_date,
+    "url": lambda x: {"url": x},
+}
+
+
+def _first_text(items: list[dict[str, Any]] | None) -> str | None:
+    if not items:
+        return None
+    item = items[0]
+    return item.get("plain_text") or item.get("text", {}).get("content")
+
+
+DECODERS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "title": lambda value: _first_text(value.get("title")),
+    "rich_text": lambda value: _first_text(value.get("rich_text")),
+    "number": lambda value: value.get("number"),
+    "select": lambda value: (value.get("select") or {}).get("name"),
+    "date": lambda value: (value.get("date") or {}).get("start"),
+    "url": lambda value: value.get("url"),
+}
+
+
+@dataclass(frozen=True)
+class Field:
+    """One tracked Notion property.
+
+    variable is the key used in update dicts, source the Encar listing key a
+    new page is filled from (converted by to_notion), and extract the key the
+    property is decoded into by extract_specific_data (through from_notion).
+    tracked fields make up the content fingerprint of a listing.
+    """
+
+    variable: str
+    property: str
+    type: str
+    source: str | None = None
+    default: Any = ""
+    to_notion: Callable[[Any], Any] | None = None
+    options: tuple[tuple[str, str], ...] = ()
+    number_format: str | None = None
+    extract: str | None = None
+    from_notion: Callable[[Any], Any] | None = None
+    tracked: bool = False
+
+    def database_property(self) -> dict[str, Any]:
+        if self.options:
+            options = [{"name": name, "color": color} for name, color in self.options]
+            return {self.type: {"options": options}}
+        if self.number_format:
+            return {self.type: {"format": self.number_format}}
+        return {self.type: {}}
+
+
+def _format_modified_date(value: str) -> str:
+    return "T".join(value.split(" ")[:1])
+
+
+_STATUS_OPTIONS = (("✅True", "green"), ("🚫False", "red"), ("🚧Pending", "yellow"))
+
+SCHEMA = (
+    Field("car_id", "Car ID", "title"),
+    Field(
+        "maker",
+        "Maker",
+        "select",
+        source="Maker",
+        options=(("현대", "blue"), ("기아", "red")),
+        extract="maker",
+    ),
+    Field("model", "Model", "rich_text", source="Model", extract="model"),
+    Field("submodel", "Submodel", "rich_text", source="Submodel", extract="submodel"),
+    Field("badge", "Badge", "rich_text", source="Badge", extract="badge", tracked=True),
+    Field(
+        "badge_detail",
+        "Badge Detail",
+        "rich_text",
+        source="BadgeDetail",
+        extract="badge_detail",
+        tracked=True,
+    ),
+    Field("transmission", "Transmission", "rich_text", source="Transmission"),
+    Field(
+        "fuel_type",
+        "Fuel Type",
+        "select",
+        source="FuelType",
+        default=0,
+        to_notion=FUEL_TYPES.get,
+        options=(
+            ("⛽Gasoline", "red"),
+            ("🛢️Diesel", "gray"),
+            ("⚡Electric", "green"),
+            ("⚡Hybrid⛽", "blue"),
+        ),
+    ),
+    Field("year", "Year", "number", source="Year", default=0),
+    Field(
+        "form_year", "Form Year", "number", source="FormYear", default=0, to_notion=int
+    ),
+    Field(
+        "mileage",
+        "Mileage",
+        "number",
+        source="Mileage",
+        default=0,
+        extract="mileage",
+        tracked=True,
+    ),
+    Field(
+        "price",
+        "Price",
+        "number",
+        source="Price",
+        default=0,
+        to_notion=lambda price: price * 10000,
+        number_format="won",
+        extract="price",
+        tracked=True,
+    ),
+    Field(
+        "location",
+        "Location",
+        "rich_text",
+        source="OfficeCityState",
+        extract="location",
+        tracked=True,
+    ),
+    Field(
+        "modified_date",
+        "Modified Date",
+        "date",
+        source="ModifiedDate",
+        to_notion=_format_modified_date,
+        extract="modified_date",
+        tracked=True,
+    ),
+    Field("url", "URL", "url"),
+    Field(
+        "insurance_inspection",
+        "Insurance & Inspection Check",
+        "select",
+        source="InsuranceInspection",
+        default=0,
+        to_notion=STATUSES.get,
+        options=_STATUS_OPTIONS,
+    ),
+    Field(
+        "availability",
+        "Availability",
+        "select",
+        source="Availability",
+        default=0,
+        to_notion=AVAILABILITY_STATUSES.get,
+        options=_STATUS_OPTIONS[:2],
+        extract="availability",
+        from_notion=AVAILABILITY.get,
+    ),
+    Field("comment", "Comment", "rich_text", extract="comment"),
+)
+
+
+def _validate(schema: tuple[Field, ...]) -> None:
+    for attribute in ("variable", "property", "source", "extract"):
+        values = [getattr(field, attribute) for field in schema]
+        values = [value for value in values if value is not None]
+        duplicates = {value for value in values if values.count(value) > 1}
+        if duplicates:
+            raise SchemaError(f"Duplicate field {attribute}(s): {sorted(duplicates)}")
+    for field in schema:
+        if field.tracked and (field.source is None or field.extract != field.variable):
+            raise SchemaError(f"{field.property}: tracked without source or extract")
+        if field.type not in ENCODERS:
+            raise SchemaError(f"{field.property}: unknown type {field.type!r}")
+        if field.options and field.type != "select":
+            raise SchemaError(f"{field.property}: options on a {field.type} field")
+        converter = getattr(field.to_notion, "__self__", None)
+        if field.options and isinstance(converter, dict):
+            names = {name for name, _ in field.options}
+            missing = set(converter.values()) - names
+            if missing:
+                raise SchemaError(f"{field.property}: no option for {sorted(missing)}")
+
+
+_validate(SCHEMA)
+FIELDS = {field.variable: field for field in SCHEMA}
+PROPERTY_NAMES = {field.variable: field.property for field in SCHEMA}
+VARIABLE_TYPES: dict[str, set[str]] = {}
+for _field in SCHEMA:
+    VARIABLE_TYPES.setdefault(_field.type, set()).add(_field.variable)
+TRACKED_FIELDS = tuple(field for field in SCHEMA if field.tracked)
+
+
+def database_properties() -> dict[str, Any]:
+    return {field.property: field.database_property() for field in SCHEMA}
+
+
+def car_url(car_id: str) -> str:
+    return (
+        "http://www.encar.com/dc/dc_cardetailview.do"
+        f"?pageid=dc_carsearch&listAdvType=pic&carid={car_id}"
+    )
+
+
+_PAGE_ENCODERS = tuple(
+    (
+        field.property,
+        field.source,
+        field.default,
+        field.to_notion,
+        ENCODERS[field.type],
+    )
+    for field in SCHEMA
+    if field.source is not None
+)
+
+
+def encode_page_properties(car_id: str, car_data: Mapping[str, Any]) -> dict[str, Any]:
+    properties = {
+        FIELDS["car_id"].property: ENCODERS["title"](car_id),
+        FIELDS["url"].property: ENCODERS["url"](car_url(car_id)),
+    }
+    for property, source, default, to_notion, encode in _PAGE_ENCODERS:
+        value = car_data.get(source, default)
+        properties[property] = encode(to_notion(value) if to_notion else value)
+    return properties
+
+
+_RECORD_DECODERS = tuple(
+    (field.extract, field.property, DECODERS[field.type], field.from_notion)
+    for field in SCHEMA
+    if field.extract is not None
+)
+
+# The properties decode_page reads, for projecting Notion queries.
+RECORD_PROPERTIES = (
+    FIELDS["car_id"].property,
+    *(property for _, property, _, _ in _RECORD_DECODERS),
+)
+
+
+def decode_page(page: dict[str, Any]) -> tuple[str, dict[str, Any]] | None:
+    """Returns (car_id, record) for a Notion page, or None if it has no Car ID."""
+    properties = page.get("properties", {})
+    car_id = DECODERS["title"](properties.get(FIELDS["car_id"].property, {}))
+    if car_id is None:
+        return None
+    record = {
+        "page_id": page.get("id"),
+        "last_edited_time": page.get("last_edited_time"),
+    }
+    for key, property, decode, from_notion in _RECORD_DECODERS:
+        value = decode(properties.get(property) or {})
+        record[key] = from_notion(value) if from_notion else value
+    return car_id, record
+
+
+def check_database(database: dict[str, Any]) -> None:
+    """Raises SchemaError when a Notion database object lacks or mistypes a field."""
+    actual = database.get("properties", {})
+    problems = []
+    for field in SCHEMA:
+        found = actual.get(field.property, {}).get("type")
+        if found != field.type:
+            problems.append(f"{field.property} (expected {field.type}, found {found})")
+    if problems:
+        raise SchemaError("Database does not match the schema: " + ", ".join(problems))
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+import aiohttp
+from metrics import metrics
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+# Notion allows an average of three requests per second per integration.
+NOTION_REQUESTS_PER_SECOND = 3.0
+NOTION_BURST = 3
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+def notion_header(api_key: str) -> dict[str, str]:
+    return {
+        "authorization": api_key,
+        "accept": "application/json",
+        "Notion-Version": NOTION_VERSION,
+    }
+
+
+@dataclass
+class WriteOutcome:
+    operation: str
+    target: str
+    status: int | None
+    attempts: int
+    error: str | None = None
+    page: dict[str, Any] | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+    @property
+    def result(self) -> str | int:
+        """The status on success or the error text, as the Notion helpers return."""
+        return self.status if self.ok else self.error
+
+
+class NotionWriteEngine:
+    """One session and one rate budget for every Notion write in a run.
+
+    429 responses are retried after their Retry-After delay and 5xx or
+    connection errors with exponential backoff. Page creations are retried
+    only when they cannot have gone through; NotionWriteEngine.request()
+    explains when. Every request leaves a WriteOutcome in outcomes for the
+    end-of-run report.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        requests_per_second: float = NOTION_REQUESTS_PER_SECOND,
+        burst: int = NOTION_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        store=None,
+        session=None,
+    ) -> None:
+        self.api_key = api_key
+        self.header = notion_header(api_key)
+        self.limiter = TokenBucket(requests_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.store = store
+        self.session = session
+        self._owns_session = session is None
+        self.outcomes: list[WriteOutcome] = []
+
+    async def __aenter__(self) -> "NotionWriteEngine":
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _retry_delay(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_seconds * 2**attempt
+
+    async def _attempt(
+        self, method: str, url: str, payload: dict[str, Any], endpoint: str
+    ) -> tuple[int, dict[str, Any] | None, str | None, str | None]:
+        """One request: (status, page on success, error text, Retry-After)."""
+        with metrics.time("request_seconds", endpoint=endpoint):
+            async with self.session.request(
+                method, url, headers=self.header, json=payload
+            ) as r:
+                metrics.inc("requests", endpoint=endpoint, status=r.status)
+                body = await r.read()
+                metrics.inc("response_bytes", len(body), endpoint=endpoint)
+                if r.status == 200:
+                    return r.status, await r.json(), None, None
+                return r.status, None, await r.text(), r.headers.get("Retry-After")
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        payload: dict[str, Any],
+        operation: str,
+        target: str,
+        on_send: Callable[[], None] | None = None,
+    ) -> WriteOutcome:
+        """on_send is called right before every attempt goes out.
+
+        A POST may have created its page even when it timed out, lost its
+        connection or got a 5xx, so it is only retried after a 429 or a
+        connection that could not be made at all.
+        """
+        url = f"{NOTION_API_URL}/{path}"
+        endpoint = f"notion_{operation}"
+        idempotent = method != "POST"
+        status, error = None, None
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            if on_send is not None:
+                on_send()
+            retry_after = None
+            try:
+                status, page, error, retry_after = await self._attempt(
+                    method, url, payload, endpoint
+                )
+                if status == 200:
+                    outcome = WriteOutcome(
+                        operation, target, status, attempt + 1, page=page
+                    )
+                    self.outcomes.append(outcome)
+                    logger.debug(
+                        f"Notion {operation} of {target} took {attempt + 1} attempt(s)",
+                        extra={"stage": endpoint},
+                    )
+                    return outcome
+            except aiohttp.ClientConnectorError as exc:
+                status, error = None, repr(exc)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                status, error = None, repr(exc)
+                if not idempotent:
+                    break
+            if status == 429:
+                metrics.inc("rate_limited", endpoint=endpoint)
+            if status is not None and status != 429 and (status < 500 or not idempotent):
+                break
+            if attempt < self.max_retries:
+                metrics.inc("retries", endpoint=endpoint)
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        outcome = WriteOutcome(operation, target, status, attempt + 1, error=error)
+        self.outcomes.append(outcome)
+        logger.warning(
+            f"Notion {operation} failed for {target}: {status} {error}",
+            extra={"stage": endpoint},
+        )
+        return outcome
+
+    async def create_page(
+        self,
+        payload: dict[str, Any],
+        car_id: str,
+        on_send: Callable[[], None] | None = None,
+    ) -> WriteOutcome:
+        outcome = await self.request(
+            "POST", "pages", payload, "create", car_id, on_send
+        )
+        if outcome.ok and self.store is not None:
+            self.store.upsert_pages([outcome.page])
+        return outcome
+
+    async def update_page(
+        self, page_id: str, properties: dict[str, Any]
+    ) -> WriteOutcome:
+        outcome = await self.request(
+            "PATCH", f"pages/{page_id}", {"properties": properties}, "update", page_id
+        )
+        if outcome.ok and self.store is not None:
+            self.store.upsert_pages([outcome.page])
+        return outcome
+
+    async def trash_page(self, page_id: str) -> WriteOutcome:
+        outcome = await self.request(
+            "PATCH", f"pages/{page_id}", {"in_trash": True}, "trash", page_id
+        )
+        if outcome.ok and self.store is not None:
+            self.store.remove_pages([page_id])
+        return outcome
+
+    def report(self) -> dict[str, dict[str, int]]:
+        """Per operation: succeeded, failed and retried request counts."""
+        summary = defaultdict(Counter)
+        for outcome in self.outcomes:
+            counts = summary[outcome.operation]
+            counts["succeeded" if outcome.ok else "failed"] += 1
+            counts["retries"] += outcome.attempts - 1
+            if not outcome.ok and outcome.status == 429:
+                counts["rate_limited"] += 1
+        return {operation: dict(counts) for operation, counts in summary.items()}
+
+
+@asynccontextmanager
+async def write_engine(
+    api_key: str, store=None, engine: NotionWriteEngine | None = None
+) -> AsyncIterator[NotionWriteEngine]:
+    """Yields the caller's engine, or a fresh one closed on exit."""
+    if engine is not None:
+        yield engine
+        return
+    async with NotionWriteEngine(api_key, store=store) as engine:
+        yield engine
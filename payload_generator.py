@@ -1,6 +1,7 @@
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable
+from notion_schema import ENCODERS, PROPERTY_NAMES, VARIABLE_TYPES
 
 
 @dataclass
@@ -77,14 +78,14 @@ class PayloadGenerator:
         if format_type in formats:
             return asdict(formats.get(format_type)(input_data))
         return None
-        
+
     def generate(
         self, properties_data: dict[str, str | int], filter_keys: set[str] | None = None
     ) -> dict:
         def should_include(property: str) -> bool:
             if not filter_keys:
                 return property in self.variable_to_property
-            return property in (self.variable_to_property and filter_keys)
+            return property in self.variable_to_property and property in filter_keys
         return {
             self.variable_to_property.get(property): self._get_payload(
                 self._get_variable_type(self.variable_types, property), value
@@ -94,31 +95,51 @@ class PayloadGenerator:
         }
 
 
-VARIABLE_PROPERTY_NAMES = {
-    "car_id": "Car ID",
-    "availability": "Availability",
-    "maker": "Maker",
-    "model": "Model",
-    "submodel": "Submodel",
-    "fuel_type": "Fuel Type",
-    "mileage": "Mileage",
-    "price": "Price",
-    "insurance_inspection": "Insurance & Insection",
-    "comment": "Comment",
-    "from_year": "From Year",
-    "year": "Year",
-    "location": "Location",
-    "transmission": "Transmission",
-    "badge_detail": "Badge Detail",
-}
-
-VARIABLE_TYPES = {
-    "title": {"car_id"},
-    "rich_text": {"model", "submodel", "badge", "badge_detail", "comment", "location", "transmission"},
-    "number": {"from_year", "year", "mileage", "price"},
-    "select": {"availability", "maker", "insurance_inspection", "fuel_type"},
-    "date": {"modified_date"},
-}
+class CompiledPayloadGenerator:
+    """PayloadGenerator with the variable table resolved once at construction.
+
+    Each variable maps straight to its property name and encoder, and payload
+    dicts are built directly instead of through dataclasses and asdict.
+    """
+
+    def __init__(
+        self, variable_to_property: dict[str, str], variable_types: dict[str, set[str]]
+    ) -> None:
+        type_of = {
+            variable: type
+            for type, variables in variable_types.items()
+            for variable in variables
+        }
+        self.table = {
+            variable: (property, ENCODERS.get(type_of.get(variable), lambda x: None))
+            for variable, property in variable_to_property.items()
+        }
+
+    def generate(
+        self, properties_data: dict[str, str | int], filter_keys: set[str] | None = None
+    ) -> dict:
+        table = self.table
+        payload = {}
+        for variable, value in properties_data.items():
+            entry = table.get(variable)
+            if entry is None or (filter_keys and variable not in filter_keys):
+                continue
+            property, encode = entry
+            payload[property] = encode(value)
+        return payload
+
+    def generate_many(
+        self,
+        rows: Iterable[dict[str, str | int]],
+        filter_keys: set[str] | None = None,
+    ) -> list[dict]:
+        generate = self.generate
+        return [generate(row, filter_keys) for row in rows]
+
+
+VARIABLE_PROPERTY_NAMES = PROPERTY_NAMES
+
+PAYLOAD_GENERATOR = CompiledPayloadGenerator(VARIABLE_PROPERTY_NAMES, VARIABLE_TYPES)
 
 
 def main():
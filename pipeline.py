@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any
+import aiohttp
+from change_set import ChangeSet
+from encar_insurance import (
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RETRIES,
+    InsuranceChecker,
+    inspection_status,
+)
+from encar_search import (
+    DEFAULT_BURST,
+    DEFAULT_CONNECTIONS,
+    DEFAULT_REQUESTS_PER_SECOND,
+    iter_encar_vehicle_data,
+)
+from fingerprint import check_updates_by_fingerprint
+from insurance_cache import InsuranceCache
+from journal import Journal, create_key
+from logger import log_context
+from notion_api import NotionQueryError, _create_notion_page, iter_notion_records
+from notion_query import NotionFilter
+from notion_schema import AVAILABILITY_STATUSES
+from notion_writer import NotionWriteEngine, write_engine
+from rate_limiter import Limiter, TokenBucket
+from reconcile import Reconciliation, reconcile
+from snapshot_store import SnapshotStore, sync_formatted_db
+from utils import Expiration
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_CREATE_WORKERS = 4
+
+# Put once per consumer on a stage's queue when its producers are done.
+_DONE = None
+
+
+@dataclass
+class PipelineResult:
+    """What one run_pipeline call crawled, created and updated."""
+
+    cars: dict[str, Any]
+    reconciliation: Reconciliation
+    created: dict[str, str | int] = field(default_factory=dict)
+    updated: dict[str, str | int] = field(default_factory=dict)
+    writes: dict[str, dict[str, int]] = field(default_factory=dict)
+
+
+class _Pipeline:
+    """The queues and workers connecting one run's stages."""
+
+    def __init__(
+        self,
+        db_id: str,
+        checker: InsuranceChecker,
+        engine: NotionWriteEngine,
+        queue_size: int,
+        insurance_workers: int,
+        create_workers: int,
+        journal: Journal | None = None,
+        store: SnapshotStore | None = None,
+    ) -> None:
+        self.db_id = db_id
+        self.journal = journal
+        self.store = store
+        self.checker = checker
+        self.engine = engine
+        self.insurance_workers = insurance_workers
+        self.create_workers = create_workers
+        # Bounded, so a slow stage holds back the one feeding it.
+        self.to_insure: asyncio.Queue = asyncio.Queue(queue_size)
+        self.to_create: asyncio.Queue = asyncio.Queue(queue_size)
+        self.cars: dict[str, Any] = {}
+        self.db_data: dict[str, dict[str, Any]] = {}
+        self.db_ready = asyncio.Event()
+        self.snapshot_time: float | None = None
+        self.created: dict[str, str | int] = {}
+        self.reconciliation: Reconciliation | None = None
+
+    async def read_notion(self, session, api_key: str, filters) -> None:
+        """Fills db_data from the snapshot store when there is one, else Notion."""
+        self.snapshot_time = time.time()
+        with log_context(stage="notion_read"):
+            if self.store is not None:
+                db_data = await sync_formatted_db(
+                    api_key, self.db_id, self.store, filters, session=session
+                )
+                if isinstance(db_data, int):
+                    raise NotionQueryError(db_data)
+                self.db_data = db_data
+            else:
+                async for batch in iter_notion_records(
+                    session, api_key, self.db_id, filters
+                ):
+                    self.db_data.update(batch)
+        self.db_ready.set()
+
+    async def crawl(self, pages) -> None:
+        """Feeds every car Notion does not know yet to the insurance stage."""
+        with log_context(stage="encar_search"):
+            try:
+                async for cars, replaced in pages:
+                    for car_id in replaced:
+                        self.cars.pop(car_id, None)
+                    self.cars.update(cars)
+                    # New cars are only known once the whole snapshot is read;
+                    # pages crawled before that wait here, the rest stream on.
+                    await self.db_ready.wait()
+                    for car_id in cars:
+                        if car_id not in self.db_data and not self._journaled(car_id):
+                            await self.to_insure.put(car_id)
+            finally:
+                # Closed here, by the task iterating it, so a cancelled crawl
+                # also cancels the page fetches the generator started.
+                await pages.aclose()
+        for _ in range(self.insurance_workers):
+            await self.to_insure.put(_DONE)
+
+    def _journaled(self, car_id: str) -> bool:
+        """Created by an interrupted run the snapshot predates."""
+        if self.journal is None:
+            return False
+        return self.journal.completed("create", create_key(self.db_id, car_id))
+
+    async def insure(self) -> None:
+        with log_context(stage="insurance"):
+            while (car_id := await self.to_insure.get()) is not _DONE:
+                if car_id not in self.cars:
+                    # Replaced by a duplicate with a smaller ID while queued.
+                    continue
+                result = await self.checker.check(car_id)
+                # A car whose history could not be fetched stays pending.
+                car = self.cars[car_id].replace(
+                    InsuranceInspection=inspection_status(result)
+                )
+                await self.to_create.put((car_id, car))
+
+    async def create(self) -> None:
+        with log_context(stage="notion_create"):
+            while (item := await self.to_create.get()) is not _DONE:
+                car_id, car = item
+                self.created[car_id] = await _create_notion_page(
+                    self.engine, self.db_id, car_id, car, self.journal
+                )
+
+    async def run_insurance_stage(self) -> None:
+        await asyncio.gather(*(self.insure() for _ in range(self.insurance_workers)))
+        for _ in range(self.create_workers):
+            await self.to_create.put(_DONE)
+
+
+async def _run(
+    session,
+    engine: NotionWriteEngine,
+    checker: InsuranceChecker,
+    api_key: str,
+    db_id: str,
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    filters: list | NotionFilter,
+    limiter: Limiter,
+    queue_size: int,
+    insurance_workers: int,
+    create_workers: int,
+    journal: Journal | None,
+    store: SnapshotStore | None,
+    expiration: Expiration | None,
+) -> PipelineResult:
+    stages = _Pipeline(
+        db_id,
+        checker,
+        engine,
+        queue_size,
+        insurance_workers,
+        create_workers,
+        journal,
+        store,
+    )
+    pages = iter_encar_vehicle_data(session, header, query, target_vehicle, limiter)
+
+    async def sync_known_cars() -> dict[str, str | int]:
+        await asyncio.gather(
+            stages.read_notion(session, api_key, filters), stages.crawl(pages)
+        )
+        # Updates need the finished sweep, so they go out while the last new
+        # cars are still in the insurance and creation stages.
+        stages.reconciliation = reconcile(stages.db_data, stages.cars)
+        changes = ChangeSet()
+        changes.update_targets(
+            check_updates_by_fingerprint(
+                stages.reconciliation.intersection, stages.cars, stages.db_data
+            )
+        )
+        changes.update_many(
+            stages.reconciliation.newly_unavailable_page_ids,
+            {"availability": AVAILABILITY_STATUSES[0]},
+            "unavailable",
+        )
+        if expiration is not None:
+            # Only cars already marked unavailable; the ones just sold keep
+            # their page until it has been unavailable for the whole period.
+            newly_unavailable = set(stages.reconciliation.newly_unavailable)
+            expired = expiration.collect_expired(
+                [
+                    car_id
+                    for car_id in stages.reconciliation.unavailable
+                    if car_id not in newly_unavailable
+                ],
+                stages.db_data,
+            )
+            changes.trash(stages.reconciliation.page_ids(expired))
+        with log_context(stage="notion_update"):
+            return await changes.apply(api_key, engine=engine, journal=journal)
+
+    tasks = [
+        asyncio.ensure_future(sync_known_cars()),
+        asyncio.ensure_future(stages.run_insurance_stage()),
+        *(asyncio.ensure_future(stages.create()) for _ in range(create_workers)),
+    ]
+    try:
+        updated, *_ = await asyncio.gather(*tasks)
+    finally:
+        # A failed stage must not leave the others blocked on a queue that
+        # nobody drains any more; waiting for them keeps its error the one
+        # that propagates.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if journal is not None:
+        journal.finish(stages.snapshot_time)
+    if checker.cache is not None:
+        checker.cache.flush()
+        logger.info(f"Insurance cache: {checker.cache.stats}", extra={"stage": "insurance"})
+    logger.info(
+        f"Pipeline: {len(stages.cars)} cars, {len(stages.created)} created, "
+        f"{len(updated)} updated",
+        extra={"stage": "pipeline"},
+    )
+    return PipelineResult(
+        cars=stages.cars,
+        reconciliation=stages.reconciliation,
+        created=stages.created,
+        updated=updated,
+        writes=engine.report(),
+    )
+
+
+async def run_pipeline(
+    api_key: str,
+    db_id: str,
+    header: dict,
+    query: str,
+    target_vehicle: list,
+    conditions: dict,
+    filters: list | NotionFilter | None = None,
+    cache: InsuranceCache | None = None,
+    session=None,
+    limiter: Limiter | None = None,
+    store: SnapshotStore | None = None,
+    engine: NotionWriteEngine | None = None,
+    journal: Journal | None = None,
+    expiration: Expiration | None = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    insurance_workers: int = DEFAULT_CONCURRENCY,
+    create_workers: int = DEFAULT_CREATE_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+) -> PipelineResult:
+    """Crawl, insurance checks and Notion writes as concurrent stages.
+
+    Search pages stream into bounded queues of insurance checks and page
+    creations, so new cars are written while the crawl is still running and
+    the wall time approaches that of the slowest stage.
+
+    With a store, the snapshot comes from sync_formatted_db (filters must
+    then be the vehicle list) and every write is mirrored into it. With an
+    expiration, pages unavailable for longer than it are trashed. With a
+    journal, a run interrupted part way resumes without repeating its
+    finished writes.
+
+    filters defaults to target_vehicle: every tracked car the snapshot holds
+    but the crawl does not find is marked unavailable, so the snapshot must
+    not reach beyond the crawled vehicle.
+    """
+    if filters is None:
+        filters = target_vehicle
+    if limiter is None:
+        limiter = TokenBucket(DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST)
+    settings = (
+        api_key,
+        db_id,
+        header,
+        query,
+        target_vehicle,
+        filters,
+        limiter,
+        queue_size,
+        insurance_workers,
+        create_workers,
+        journal,
+        store,
+        expiration,
+    )
+    async with AsyncExitStack() as stack:
+        if session is None:
+            connector = aiohttp.TCPConnector(limit=DEFAULT_CONNECTIONS)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector)
+            )
+        engine = await stack.enter_async_context(write_engine(api_key, store, engine))
+        executor = stack.enter_context(ProcessPoolExecutor())
+        checker = InsuranceChecker(
+            session,
+            header,
+            conditions,
+            executor,
+            insurance_workers,
+            retries,
+            backoff_seconds,
+            cache,
+        )
+        return await _run(session, engine, checker, *settings)
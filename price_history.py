@@ -0,0 +1,245 @@
+import os
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, NamedTuple
+
+_COLUMNS = {
+    "car": "I",
+    "timestamp": "q",
+    "price": "i",
+    "mileage": "i",
+    "availability": "b",
+}
+
+
+class Observation(NamedTuple):
+    car_id: str
+    timestamp: datetime
+    price: int
+    mileage: int
+    availability: int
+
+
+class PriceDrop(NamedTuple):
+    car_id: str
+    peak_price: int
+    price: int
+    drop_pct: float
+
+
+class PriceHistory:
+    """Append-only per-car time series stored as one typed array per column.
+
+    Car IDs are interned to row-independent integer indexes, so the columns
+    hold only machine integers and range scans never build per-row dicts.
+    A re-listed car is linked to its previous car_id and inherits its series.
+    Columns are written one file at a time, so loading cuts every file back
+    to the rows all of them hold; a crash mid-append loses only that batch.
+    """
+
+    def __init__(self, directory: str = "price_history") -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.columns = {name: array(code) for name, code in _COLUMNS.items()}
+        for name, column in self.columns.items():
+            path = self._column_path(name)
+            if os.path.exists(path):
+                with open(path, "rb") as fp:
+                    column.fromfile(fp, os.path.getsize(path) // column.itemsize)
+        self.car_ids: list[str] = []
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, "r", encoding="utf-8") as fp:
+                text = fp.read()
+            # A torn last line is an ID whose write never finished.
+            self.car_ids = text.splitlines()
+            if text and not text.endswith("\n"):
+                self.car_ids.pop()
+        self._truncate_to_complete_rows()
+        self._index = {car_id: i for i, car_id in enumerate(self.car_ids)}
+        self.links: dict[str, str] = {}
+        if os.path.exists(self._links_path):
+            with open(self._links_path, "r", encoding="utf-8") as fp:
+                self.links = dict(line.split(" ") for line in fp.read().splitlines())
+
+    def _truncate_to_complete_rows(self) -> None:
+        rows = min(len(column) for column in self.columns.values())
+        for name, column in self.columns.items():
+            path = self._column_path(name)
+            if os.path.exists(path) and os.path.getsize(path) != rows * column.itemsize:
+                with open(path, "r+b") as fp:
+                    fp.truncate(rows * column.itemsize)
+            del column[rows:]
+        # IDs are written before the rows that use them; drop any left unused.
+        car_column = self.columns["car"]
+        used = max(car_column) + 1 if car_column else 0
+        if len(self.car_ids) > used or (
+            os.path.exists(self._ids_path)
+            and os.path.getsize(self._ids_path)
+            != sum(len(car_id.encode("utf-8")) + 1 for car_id in self.car_ids)
+        ):
+            del self.car_ids[used:]
+            with open(self._ids_path, "w", encoding="utf-8") as fp:
+                fp.write("".join(f"{car_id}\n" for car_id in self.car_ids))
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+
+    @property
+    def _ids_path(self) -> str:
+        return os.path.join(self.directory, "car_ids.txt")
+
+    @property
+    def _links_path(self) -> str:
+        return os.path.join(self.directory, "links.txt")
+
+    def link(self, car_id: str, previous_id: str) -> None:
+        """Record that car_id re-lists previous_id."""
+        if car_id == previous_id or self.links.get(car_id) == previous_id:
+            return
+        self.links[car_id] = previous_id
+        with open(self._links_path, "a", encoding="utf-8") as fp:
+            fp.write(f"{car_id} {previous_id}\n")
+
+    def lineage(self, car_id: str) -> list[str]:
+        """car_id and the listings it re-lists, oldest first."""
+        chain = [car_id]
+        while chain[-1] in self.links and self.links[chain[-1]] not in chain:
+            chain.append(self.links[chain[-1]])
+        return chain[::-1]
+
+    def _intern(self, car_id: str, new_ids: list[str]) -> int:
+        index = self._index.get(car_id)
+        if index is None:
+            index = self._index[car_id] = len(self.car_ids)
+            self.car_ids.append(car_id)
+            new_ids.append(car_id)
+        return index
+
+    def append(self, observations: Iterable[Observation]) -> None:
+        batch = {name: array(code) for name, code in _COLUMNS.items()}
+        new_ids = []
+        timestamps = self.columns["timestamp"]
+        last = timestamps[-1] if timestamps else None
+        for car_id, timestamp, price, mileage, availability in observations:
+            ts = int(timestamp.timestamp())
+            if last is not None and ts < last:
+                raise ValueError("observations must be appended in time order")
+            last = ts
+            batch["car"].append(self._intern(car_id, new_ids))
+            batch["timestamp"].append(ts)
+            batch["price"].append(price)
+            batch["mileage"].append(mileage)
+            batch["availability"].append(availability)
+
+        if new_ids:
+            with open(self._ids_path, "a", encoding="utf-8") as fp:
+                fp.write("".join(f"{car_id}\n" for car_id in new_ids))
+        for name, values in batch.items():
+            with open(self._column_path(name), "ab") as fp:
+                values.tofile(fp)
+            self.columns[name].extend(values)
+
+    def record_listings(
+        self, cars: dict[str, dict[str, Any]], timestamp: datetime | None = None
+    ) -> None:
+        """Append one observation per car from get_encar_vehicle_data output."""
+        timestamp = timestamp or datetime.now(tz=timezone.utc)
+        self.append(
+            Observation(
+                car_id,
+                timestamp,
+                int(car.get("Price") or 0),
+                int(car.get("Mileage") or 0),
+                int(car.get("Availability", 1)),
+            )
+            for car_id, car in cars.items()
+        )
+
+    def record_unavailable(
+        self, car_ids: Iterable[str], timestamp: datetime | None = None
+    ) -> None:
+        """Append an unavailable observation carrying each car's last price and mileage."""
+        timestamp = timestamp or datetime.now(tz=timezone.utc)
+        latest = self._latest_rows({self._index[id] for id in car_ids if id in self._index})
+        price, mileage = self.columns["price"], self.columns["mileage"]
+        self.append(
+            Observation(self.car_ids[car], timestamp, price[row], mileage[row], 0)
+            for car, row in latest.items()
+        )
+
+    def _latest_rows(self, cars: set[int]) -> dict[int, int]:
+        latest = {}
+        car_column = self.columns["car"]
+        for row in range(len(car_column) - 1, -1, -1):
+            car = car_column[row]
+            if car in cars and car not in latest:
+                latest[car] = row
+                if len(latest) == len(cars):
+                    break
+        return latest
+
+    def history(self, car_id: str) -> list[Observation]:
+        """Observations of car_id and every listing it re-lists, in time order."""
+        cars = {
+            self._index[id]: id for id in self.lineage(car_id) if id in self._index
+        }
+        if not cars:
+            return []
+        columns = self.columns
+        return [
+            Observation(
+                cars[value],
+                datetime.fromtimestamp(columns["timestamp"][row], tz=timezone.utc),
+                columns["price"][row],
+                columns["mileage"][row],
+                columns["availability"][row],
+            )
+            for row, value in enumerate(columns["car"])
+            if value in cars
+        ]
+
+    def price_drops(
+        self,
+        min_drop_pct: float,
+        window: timedelta = timedelta(days=7),
+        now: datetime | None = None,
+    ) -> list[PriceDrop]:
+        """Cars whose latest price is at least min_drop_pct below their peak in the window."""
+        now = now or datetime.now(tz=timezone.utc)
+        timestamps = self.columns["timestamp"]
+        start = bisect_left(timestamps, int((now - window).timestamp()))
+        end = len(timestamps)
+
+        # Every listing of a re-listed car counts towards its newest car_id.
+        owner = array("I", range(len(self.car_ids)))
+        newest = {}
+        for car_id in self.links:
+            chain = self.lineage(car_id)
+            if len(chain) > len(newest.get(chain[0], ())):
+                newest[chain[0]] = chain
+        for chain in newest.values():
+            for car_id in chain[:-1]:
+                if car_id in self._index and chain[-1] in self._index:
+                    owner[self._index[car_id]] = self._index[chain[-1]]
+
+        peak = array("i", [-1]) * len(self.car_ids)
+        latest = array("i", [-1]) * len(self.car_ids)
+        car_column, price_column = self.columns["car"], self.columns["price"]
+        for car, price in zip(car_column[start:end], price_column[start:end]):
+            car = owner[car]
+            if price > peak[car]:
+                peak[car] = price
+            latest[car] = price
+
+        drops = []
+        for car, (peak_price, price) in enumerate(zip(peak, latest)):
+            if peak_price <= 0:
+                continue
+            drop_pct = (peak_price - price) / peak_price * 100
+            if drop_pct >= min_drop_pct:
+                drops.append(PriceDrop(self.car_ids[car], peak_price, price, drop_pct))
+        return sorted(drops, key=lambda drop: drop.drop_pct, reverse=True)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Hashable, Protocol
+
+
+class Limiter(Protocol):
+    async def acquire(self) -> None: ...
+
+
+class Unlimited:
+    """A Limiter that never waits, for replays and local benchmarks."""
+
+    async def acquire(self) -> None:
+        return None
+
+
+class TokenBucket:
+    """Async token bucket shared by every request that draws from the same budget."""
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class _TargetShare:
+    def __init__(self, bucket: "WeightedTokenBucket", key: Hashable) -> None:
+        self._bucket = bucket
+        self._key = key
+
+    async def acquire(self) -> None:
+        await self._bucket.acquire(self._key)
+
+
+class WeightedTokenBucket:
+    """Token bucket whose tokens are shared fairly between targets.
+
+    Each waiting target is served in order of tokens received divided by its
+    priority, so a target with priority 2 gets twice the share of one with
+    priority 1 and no target starves while others are busy.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        self._bucket = TokenBucket(rate, capacity)
+        self._waiters: dict[Hashable, deque[asyncio.Future]] = defaultdict(deque)
+        self._priorities: dict[Hashable, int] = {}
+        self._served: dict[Hashable, float] = defaultdict(float)
+        self._dispatcher: asyncio.Task | None = None
+
+    def for_target(self, key: Hashable, priority: int = 1) -> _TargetShare:
+        if priority < 1:
+            raise ValueError("priority must be at least 1")
+        self._priorities[key] = priority
+        return _TargetShare(self, key)
+
+    def _activate(self, key: Hashable) -> None:
+        # A target joining late starts level with the least-served active one
+        # instead of claiming every token until it catches up.
+        active = [self._served[k] for k, q in self._waiters.items() if q and k != key]
+        if active:
+            self._served[key] = max(self._served[key], min(active))
+
+    def _next_key(self) -> Hashable | None:
+        active = [k for k, q in self._waiters.items() if q]
+        if not active:
+            return None
+        return min(active, key=lambda k: self._served[k])
+
+    async def _dispatch(self) -> None:
+        while self._next_key() is not None:
+            await self._bucket.acquire()
+            key = self._next_key()
+            if key is None:
+                return
+            future = self._waiters[key].popleft()
+            if future.cancelled():
+                continue
+            self._served[key] += 1 / self._priorities.get(key, 1)
+            future.set_result(None)
+
+    async def acquire(self, key: Hashable) -> None:
+        future = asyncio.get_running_loop().create_future()
+        if not self._waiters[key]:
+            self._activate(key)
+        self._waiters[key].append(future)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
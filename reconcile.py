@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import Any, Mapping
+from metrics import metrics
+
+
+@dataclass
+class Reconciliation:
+    """Partitions of one Encar sweep against the Notion snapshot.
+
+    new, intersection and unavailable match utils.identify_differences;
+    relisted are intersection cars the snapshot marks unavailable and
+    newly_unavailable are unavailable cars it still marks available.
+    """
+
+    db_data: Mapping[str, Mapping[str, Any]]
+    new: list[str]
+    intersection: list[str]
+    unavailable: list[str]
+    relisted: list[str]
+    newly_unavailable: list[str]
+
+    def page_ids(self, car_ids: list[str]) -> list[str]:
+        db_data = self.db_data
+        return [db_data[car_id].get("page_id") for car_id in car_ids]
+
+    @property
+    def relisted_page_ids(self) -> list[str]:
+        return self.page_ids(self.relisted)
+
+    @property
+    def newly_unavailable_page_ids(self) -> list[str]:
+        return self.page_ids(self.newly_unavailable)
+
+    @property
+    def unavailable_page_ids(self) -> list[str]:
+        return self.page_ids(self.unavailable)
+
+
+def reconcile(
+    db_data: Mapping[str, Mapping[str, Any]], api_data: Mapping[str, Any]
+) -> Reconciliation:
+    """Hash-based partitioning; db_data is the extract_specific_data view.
+
+    Each snapshot record is looked up in the sweep once and each sweep ID in
+    the snapshot once, so the cost is linear in the number of IDs.
+    """
+    metrics.inc("records", len(api_data), stage="reconcile")
+    intersection, unavailable, relisted, newly_unavailable = [], [], [], []
+    for car_id, record in db_data.items():
+        available = record.get("availability") is True
+        if car_id in api_data:
+            intersection.append(car_id)
+            if not available:
+                relisted.append(car_id)
+        else:
+            unavailable.append(car_id)
+            if available:
+                newly_unavailable.append(car_id)
+    return Reconciliation(
+        db_data=db_data,
+        new=[car_id for car_id in api_data if car_id not in db_data],
+        intersection=intersection,
+        unavailable=unavailable,
+        relisted=relisted,
+        newly_unavailable=newly_unavailable,
+    )
@@ -0,0 +1,299 @@
+import sqlite3
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+import aiohttp
+from fingerprint import fingerprint, record_values
+from notion_api import (
+    NotionQueryError,
+    extract_specific_data,
+    iter_notion_page_ids,
+    iter_notion_records,
+)
+from notion_query import NotionFilter
+
+DEFAULT_RESYNC_INTERVAL = timedelta(days=1)
+DEFAULT_ID_CHECK_INTERVAL = timedelta(hours=1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cars (
+    car_id TEXT PRIMARY KEY,
+    page_id TEXT,
+    maker TEXT,
+    model TEXT,
+    submodel TEXT,
+    availability INTEGER,
+    price INTEGER,
+    comment TEXT,
+    last_edited_time TEXT,
+    badge TEXT,
+    badge_detail TEXT,
+    mileage INTEGER,
+    location TEXT,
+    modified_date TEXT,
+    fingerprint TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_page_id ON cars (page_id);
+CREATE INDEX IF NOT EXISTS idx_cars_vehicle ON cars (maker, model, submodel);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = (
+    "car_id",
+    "page_id",
+    "maker",
+    "model",
+    "submodel",
+    "availability",
+    "price",
+    "comment",
+    "last_edited_time",
+    "badge",
+    "badge_detail",
+    "mileage",
+    "location",
+    "modified_date",
+    "fingerprint",
+)
+
+
+def _scope(filters: list | None) -> str:
+    return "|".join(filters) if filters else "*"
+
+
+def _now() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+class SnapshotStore:
+    """Local mirror of the Notion database keyed like extract_specific_data."""
+
+    def __init__(self, file_name: str = "snapshot.db") -> None:
+        self.conn = sqlite3.connect(file_name)
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _migrate(self) -> None:
+        """Adds columns missing from older snapshots and forces a full resync."""
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(cars)")}
+        missing = [column for column in _COLUMNS if column not in existing]
+        if not missing:
+            return
+        with self.conn:
+            for column in missing:
+                self.conn.execute(f"ALTER TABLE cars ADD COLUMN {column}")
+            self.conn.execute("DELETE FROM meta")
+
+    def _where(self, filters: list | None) -> tuple[str, tuple]:
+        if not filters:
+            return "", ()
+        return " WHERE maker = ? AND model = ? AND submodel = ?", tuple(filters)
+
+    def load(self, filters: list | None = None) -> dict[str, dict[str, Any]]:
+        where, params = self._where(filters)
+        rows = self.conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM cars{where}", params
+        )
+        snapshot = {}
+        for row in rows:
+            car = dict(zip(_COLUMNS[1:], row[1:]))
+            if car["availability"] is not None:
+                car["availability"] = bool(car["availability"])
+            snapshot[row[0]] = car
+        return snapshot
+
+    def _upsert(self, records: dict[str, dict[str, Any]]) -> None:
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO cars ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+            (
+                (
+                    car_id,
+                    *(car.get(column) for column in _COLUMNS[1:-1]),
+                    fingerprint(record_values(car)),
+                )
+                for car_id, car in records.items()
+            ),
+        )
+
+    def _get_times(self, keys: set[str]) -> list[datetime]:
+        rows = self.conn.execute(
+            f"SELECT value FROM meta WHERE key IN ({', '.join('?' * len(keys))})",
+            tuple(keys),
+        ).fetchall()
+        return [datetime.fromisoformat(value) for (value,) in rows]
+
+    def _set_time(self, key: str, value: datetime) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, value.isoformat()),
+        )
+
+    def upsert_records(self, records: dict[str, dict[str, Any]]) -> None:
+        with self.conn:
+            self._upsert(records)
+
+    def upsert_pages(self, notion_pages: list[dict[str, Any]]) -> None:
+        """Record pages returned by a successful Notion create or update."""
+        with self.conn:
+            self._upsert(extract_specific_data(notion_pages))
+
+    def page_ids(self, filters: list | None = None) -> set[str]:
+        where, params = self._where(filters)
+        rows = self.conn.execute(f"SELECT page_id FROM cars{where}", params)
+        return {page_id for (page_id,) in rows}
+
+    def remove_pages(self, page_ids: Iterable[str]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM cars WHERE page_id = ?", ((id,) for id in page_ids)
+            )
+
+    @contextmanager
+    def replacing(
+        self, filters: list | None = None
+    ) -> Iterator[Callable[[dict[str, dict[str, Any]]], None]]:
+        """Yields a writer for streamed records that replace the filtered scope.
+
+        Nothing is committed unless the block completes, so a failed resync
+        leaves the previous snapshot in place.
+        """
+        where, params = self._where(filters)
+        started = _now()
+        with self.conn:
+            self.conn.execute(f"DELETE FROM cars{where}", params)
+            yield self._upsert
+            self._set_time(f"resync:{_scope(filters)}", started)
+
+    def replace(self, notion_db: list[dict[str, Any]], filters: list | None = None) -> None:
+        """Replace everything in the filtered scope with a full Notion read."""
+        with self.replacing(filters) as write:
+            write(extract_specific_data(notion_db))
+
+    def last_resync(self, filters: list | None = None) -> datetime | None:
+        keys = {f"resync:{_scope(None)}", f"resync:{_scope(filters)}"}
+        return max(self._get_times(keys), default=None)
+
+    def last_sync(self, filters: list | None = None) -> datetime | None:
+        """Start of the latest full or delta read covering the filtered scope."""
+        keys = {
+            f"resync:{_scope(None)}",
+            f"resync:{_scope(filters)}",
+            f"delta:{_scope(filters)}",
+        }
+        return max(self._get_times(keys), default=None)
+
+    def mark_delta(self, filters: list | None, started: datetime) -> None:
+        with self.conn:
+            self._set_time(f"delta:{_scope(filters)}", started)
+
+    def last_id_check(self, filters: list | None = None) -> datetime | None:
+        """Start of the latest full read or ID listing of the filtered scope."""
+        keys = {
+            f"resync:{_scope(None)}",
+            f"resync:{_scope(filters)}",
+            f"ids:{_scope(filters)}",
+        }
+        return max(self._get_times(keys), default=None)
+
+    def mark_id_check(self, filters: list | None, started: datetime) -> None:
+        with self.conn:
+            self._set_time(f"ids:{_scope(filters)}", started)
+
+    def needs_resync(
+        self, filters: list | None = None, max_age: timedelta = DEFAULT_RESYNC_INTERVAL
+    ) -> bool:
+        last = self.last_resync(filters)
+        return last is None or _now() - last > max_age
+
+
+@asynccontextmanager
+async def _client_session(session=None) -> AsyncIterator[aiohttp.ClientSession]:
+    """Yields the caller's session, or a fresh one closed on exit."""
+    if session is not None:
+        yield session
+        return
+    async with aiohttp.ClientSession() as session:
+        yield session
+
+
+async def load_formatted_db(
+    api_key: str,
+    db_id: str,
+    store: SnapshotStore,
+    filters: list = None,
+    resync: bool = False,
+    max_age: timedelta = DEFAULT_RESYNC_INTERVAL,
+    session=None,
+) -> dict[str, dict[str, Any]] | int:
+    """Return the extract_specific_data view, reading Notion only when a resync is due."""
+    if resync or store.needs_resync(filters, max_age):
+        async with _client_session(session) as session:
+            try:
+                with store.replacing(filters) as write:
+                    async for batch in iter_notion_records(
+                        session, api_key, db_id, filters
+                    ):
+                        write(batch)
+            except NotionQueryError as exc:
+                return exc.status
+    return store.load(filters)
+
+
+async def _remove_deleted_pages(
+    session, api_key: str, db_id: str, store: SnapshotStore, filters: list | None
+) -> None:
+    started = _now()
+    # Taken first, so pages created while the listing runs are never removed.
+    known = store.page_ids(filters)
+    live = set()
+    async for page_ids in iter_notion_page_ids(session, api_key, db_id, filters):
+        live.update(page_ids)
+    store.remove_pages(known - live)
+    store.mark_id_check(filters, started)
+
+
+async def sync_formatted_db(
+    api_key: str,
+    db_id: str,
+    store: SnapshotStore,
+    filters: list = None,
+    max_age: timedelta = DEFAULT_RESYNC_INTERVAL,
+    id_check_interval: timedelta = DEFAULT_ID_CHECK_INTERVAL,
+    session=None,
+) -> dict[str, dict[str, Any]] | int:
+    """Like load_formatted_db, but reads only pages edited since the last sync.
+
+    Notion's query endpoint never returns trashed pages, so a delta cannot
+    show deletions. Instead, once id_check_interval has passed, the IDs of
+    the live pages are listed and snapshot pages missing from that listing
+    are removed. A page deleted in Notion therefore stays in the snapshot
+    for up to id_check_interval, rather than until the next full resync.
+    """
+    since = store.last_sync(filters)
+    if since is None or store.needs_resync(filters, max_age):
+        return await load_formatted_db(
+            api_key, db_id, store, filters, resync=True, session=session
+        )
+
+    # last_edited_time is only kept to the minute, so step back a whole one.
+    since = since.replace(second=0, microsecond=0) - timedelta(minutes=1)
+    query = NotionFilter.from_vehicle(filters).edited_on_or_after(since)
+    started = _now()
+    last_id_check = store.last_id_check(filters)
+    async with _client_session(session) as session:
+        try:
+            async for records in iter_notion_records(session, api_key, db_id, query):
+                store.upsert_records(records)
+            if last_id_check is None or started - last_id_check > id_check_interval:
+                await _remove_deleted_pages(session, api_key, db_id, store, filters)
+        except NotionQueryError as exc:
+            return exc.status
+    store.mark_delta(filters, started)
+    return store.load(filters)
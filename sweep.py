@@ -0,0 +1,99 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+import aiohttp
+from encar_search import (
+    DEFAULT_BURST,
+    DEFAULT_CONNECTIONS,
+    DEFAULT_REQUESTS_PER_SECOND,
+    get_encar_vehicle_data_async,
+    get_query,
+)
+from incremental import WatermarkStore, get_encar_vehicle_data_incremental
+from price_history import PriceHistory
+from rate_limiter import WeightedTokenBucket
+
+
+@dataclass
+class SweepTarget:
+    maker: str
+    model: str
+    submodel: str
+    conditions: dict[str, Any] = field(default_factory=dict)
+    priority: int = 1
+
+    @property
+    def vehicle(self) -> list[str]:
+        return [self.maker, self.model, self.submodel]
+
+    @property
+    def query(self) -> str:
+        return get_query(self.maker, self.model, self.submodel, **self.conditions)
+
+
+@dataclass
+class SweepResult:
+    target: SweepTarget
+    data: dict[str, dict[str, Any]] | None = None
+    error: Exception | None = None
+    changed: bool = True
+    relisted: dict[str, str] = field(default_factory=dict)
+
+
+async def sweep_vehicle_data(
+    header: dict,
+    targets: list[SweepTarget],
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    burst: int = DEFAULT_BURST,
+    connections: int = DEFAULT_CONNECTIONS,
+    watermarks: WatermarkStore | None = None,
+    history: PriceHistory | None = None,
+) -> AsyncIterator[SweepResult]:
+    """Crawl every target under one request budget, yielding each as it completes.
+
+    With watermarks, targets are crawled incrementally, unchanged ones are
+    reported with changed=False and re-listed cars are linked in relisted.
+    With a history, every crawled car is recorded in it before its result
+    is yielded, and relisted links carry a car's series over to its new ID.
+    """
+    limiter = WeightedTokenBucket(requests_per_second, burst)
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def crawl(index: int, target: SweepTarget) -> SweepResult:
+            share = limiter.for_target(index, target.priority)
+            try:
+                if watermarks is None:
+                    data = await get_encar_vehicle_data_async(
+                        header, target.query, target.vehicle, session, share
+                    )
+                    return SweepResult(target, data=data)
+                data, changed = await get_encar_vehicle_data_incremental(
+                    header, target.query, target.vehicle, watermarks, session, share
+                )
+                return SweepResult(
+                    target,
+                    data=data,
+                    changed=changed,
+                    relisted=watermarks.relisted(target.query) if changed else {},
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                return SweepResult(target, error=exc)
+
+        tasks = [
+            asyncio.create_task(crawl(index, target))
+            for index, target in enumerate(targets)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                if history is not None and result.data is not None:
+                    for car_id, previous_id in result.relisted.items():
+                        history.link(car_id, previous_id)
+                    history.record_listings(result.data)
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            if watermarks is not None:
+                watermarks.save()
@@ -2,6 +2,7 @@ from datetime import datetime, timezone, timedelta
 import json
 from typing import Union, Iterable, Any
 from collections import defaultdict
+from collections.abc import Mapping
 
 
 class Expiration:
@@ -108,12 +109,19 @@ def check_updates_for_intersection(
     return dict(changes) if changes else {}
 
 
+def _to_json(value: Any) -> Any:
+    """Mappings such as Listing are written as the dicts they stand for."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
 def write_file(
     file_name: str, input_text: Union[str, dict, list], file_type: str = "json"
 ) -> None:
     with open(file_name, "w", encoding="utf-8") as fp:
         if file_type == "json":
-            json.dump(input_text, fp, indent=4, ensure_ascii=False)
+            json.dump(input_text, fp, indent=4, ensure_ascii=False, default=_to_json)
         else:
             fp.write(input_text)
 
@@ -123,7 +131,7 @@ def write_file_append(
 ) -> None:
     with open(file_name, "a", encoding="utf-8") as fp:
         if file_type == "json":
-            json.dump(input_text, fp, indent=4, ensure_ascii=False)
+            json.dump(input_text, fp, indent=4, ensure_ascii=False, default=_to_json)
         else:
             fp.write(input_text)
 